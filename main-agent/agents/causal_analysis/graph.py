@@ -10,7 +10,7 @@ from .nodes.config_selection import build_config_selection_node
 from .nodes.dowhy_analysis import build_dowhy_analysis_node
 from .nodes.generate_answer import build_generate_answer_node
 
-def generate_causal_analysis_graph(llm):
+def generate_causal_analysis_graph(llm, fetch_mode: str = "fetchall"):
     graph = StateGraph(CausalAnalysisState)
 
     # Add entry node for conditional routing
@@ -19,7 +19,7 @@ def generate_causal_analysis_graph(llm):
     # Add nodes
     graph.add_node("parse_question", build_parse_question_node(llm))
     graph.add_node("generate_sql_query", build_generate_sql_query_node(llm))
-    graph.add_node("fetch_data", build_fetch_data_node(llm))
+    graph.add_node("fetch_data", build_fetch_data_node(llm, fetch_mode=fetch_mode))
     graph.add_node("preprocess", build_preprocess_node())
     graph.add_node("config_selection", build_config_selection_node(llm))
     graph.add_node("dowhy_analysis", build_dowhy_analysis_node())
@@ -2,10 +2,12 @@
 
 import pandas as pd
 import json
-from typing import Dict
-from utils.database import Database 
-from utils.llm import call_llm
+from typing import Dict, List
+from utils.database import Database, STREAM_ITERSIZE, QueryTimeoutError
+from utils.llm import call_llm, call_llm_async
+from utils.sql_sampling import build_sampled_sql, SAMPLE_COLUMN_PREFIX
 from prompts.causal_agent_prompts import fix_sql_prompt, fix_sql_parser, sql_query_parser
+from langchain_core.runnables import RunnableLambda
 from langchain_core.language_models.chat_models import BaseChatModel
 
 database = Database()
@@ -16,64 +18,154 @@ def prepare_state(state: dict) -> dict:
         state["parsed_query"] = state["variable_info"]
     return state
 
-def build_fetch_data_node(llm: BaseChatModel):
-    def node(state: Dict) -> Dict:
+def validate_columns(df: pd.DataFrame, expected_columns_base: List[str]) -> pd.DataFrame:
+    missing = [col for col in expected_columns_base if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing expected columns in SQL result: {missing}")
+    return df
+
+def raise_if_cancelled(error: Exception):
+    # 외부에서 취소된 쿼리는 SQL 수정으로 해결되지 않으므로 재시도하지 않음
+    if isinstance(error, QueryTimeoutError) and error.cancelled:
+        raise error
+
+def _treatment_column(state: Dict):
+    treatment = (state["parsed_query"] or {}).get("treatment")
+    return treatment.split(".")[-1] if isinstance(treatment, str) else None
+
+def sample_query(state: Dict, sql: str):
+    """Applies state["sampling"] to the extraction SQL. Returns (sql, sample_info or None)."""
+    if not state["sampling"]:
+        return sql, None
+    # 모집단 크기는 planner 추정치(결과 행 수)로 사용
+    population = database.explain(sql=sql, db_id=state["db_id"], readonly=True).get("Plan Rows")
+    return build_sampled_sql(sql, state["sampling"], result_rows=population, treatment_column=_treatment_column(state))
+
+async def sample_query_async(state: Dict, sql: str):
+    if not state["sampling"]:
+        return sql, None
+    population = (await database.explain_async(sql=sql, db_id=state["db_id"], readonly=True)).get("Plan Rows")
+    return build_sampled_sql(sql, state["sampling"], result_rows=population, treatment_column=_treatment_column(state))
+
+def record_sample(state: Dict, df: pd.DataFrame, sampled_sql: str, sample_info) -> pd.DataFrame:
+    if sample_info is None:
+        return df
+    df = df.drop(columns=[c for c in df.columns if c.startswith(SAMPLE_COLUMN_PREFIX)])
+    state["sample_info"] = {**sample_info, "sample_size": len(df), "sampled_sql": sampled_sql}
+    return df
+
+def build_fetch_data_node(llm: BaseChatModel, fetch_mode: str = "fetchall", itersize: int = STREAM_ITERSIZE):
+    """
+    fetch_mode:
+    - "fetchall": fetch every row at once (through the result cache), then build the DataFrame
+    - "stream": named server-side cursor, DataFrame built in typed chunks of `itersize` rows
+    - "copy": `COPY (...) TO STDOUT` parsed straight into typed columns (fastest on wide joins)
+
+    If state["sampling"] is set, the extraction SQL is rewritten to a server-side sample
+    (see utils.sql_sampling) and the applied method/seed/size is recorded in state["sample_info"].
+    """
+    if fetch_mode not in ("fetchall", "stream", "copy"):
+        raise ValueError(f"Unsupported fetch_mode: {fetch_mode}. Use 'fetchall', 'stream' or 'copy'.")
+
+    def fetch_df(db_id: str, sql: str) -> pd.DataFrame:
+        return database.fetch_dataframe(sql=sql, db_id=db_id, mode=fetch_mode, itersize=itersize,
+                                        readonly=True)
+
+    async def fetch_df_async(db_id: str, sql: str) -> pd.DataFrame:
+        return await database.fetch_dataframe_async(sql=sql, db_id=db_id, mode=fetch_mode, itersize=itersize,
+                                                    readonly=True)
+
+    def _prepare(state: Dict):
         if "parsed_query" not in state:
             state = prepare_state(state)
-        
-        sql_query = state["sql_query"]
-        schema_str = state["table_schema_str"]
 
-        if not sql_query:
+        if not state["sql_query"]:
             raise ValueError("No SQL query found in state. Please run generate_sql_query_node first.")
 
-        db_id = state["db_id"]
-        if not db_id:
+        if not state["db_id"]:
             raise ValueError("Missing 'db_id' in state")
 
-
         graph_nodes = state["causal_graph"]["nodes"]
-        expression_dict = state["expression_dict"]
-        expected_columns_base = [v.split(".")[-1] for v in graph_nodes]        
-        
         expected_columns_base = [var.split('.')[-1] for var in graph_nodes]
-             
-        def run_and_validate_query(sql, db_id, expected_columns_base):
-            rows, columns = database.run_query(sql=sql, db_id=db_id)
-            df = pd.DataFrame(rows, columns=columns)
+        return state, expected_columns_base
+
+    def _fix_sql_variables(state: Dict, last_error: str) -> Dict:
+        return {
+            "original_sql": state["sql_query"],
+            "error_message": last_error,
+            "graph_nodes": state["causal_graph"]["nodes"],
+            "expression_dict": json.dumps(state["expression_dict"], indent=2),
+            "table_schemas": state["table_schema_str"],
+        }
+
+    def node(state: Dict) -> Dict:
+        state, expected_columns_base = _prepare(state)
+        db_id = state["db_id"]
 
-            missing = [col for col in expected_columns_base if col not in df.columns]
-            if missing:
-                raise ValueError(f"Missing expected columns in SQL result: {missing}")
-            return df
+        def run_and_validate_query(sql):
+            sampled_sql, sample_info = sample_query(state, sql)
+            df = record_sample(state, fetch_df(db_id, sampled_sql), sampled_sql, sample_info)
+            return validate_columns(df, expected_columns_base)
 
         try:
-            df = run_and_validate_query(sql_query, db_id, expected_columns_base)
+            df = run_and_validate_query(state["sql_query"])
         except Exception as e:
+            raise_if_cancelled(e)
             last_error = str(e)
             for _ in range(3): # Retry up to 3 times
                 revised_response = call_llm(
                     prompt=fix_sql_prompt,
                     parser=fix_sql_parser,
-                    variables={
-                        "original_sql": sql_query,
-                        "error_message": last_error,
-                        "graph_nodes": graph_nodes,
-                        "expression_dict": json.dumps(expression_dict, indent=2),
-                        "table_schemas": schema_str,
-                    },
+                    variables=_fix_sql_variables(state, last_error),
                     llm=llm
                 )
                 revised_query = revised_response.sql_query
                 try:
-                    df = run_and_validate_query(revised_query, db_id, expected_columns_base)
+                    df = run_and_validate_query(revised_query)
                     state["sql_query"] = revised_query
                     break
                 except Exception as second_error:
+                    raise_if_cancelled(second_error)
                     last_error = str(second_error)
             else:
                 raise RuntimeError(f"SQL retry also failed: {last_error}")
 
         state["df_raw"] = df
         return state
-    return node
\ No newline at end of file
+
+    async def anode(state: Dict) -> Dict:
+        state, expected_columns_base = _prepare(state)
+        db_id = state["db_id"]
+
+        async def run_and_validate_query(sql):
+            sampled_sql, sample_info = await sample_query_async(state, sql)
+            df = record_sample(state, await fetch_df_async(db_id, sampled_sql), sampled_sql, sample_info)
+            return validate_columns(df, expected_columns_base)
+
+        try:
+            df = await run_and_validate_query(state["sql_query"])
+        except Exception as e:
+            raise_if_cancelled(e)
+            last_error = str(e)
+            for _ in range(3): # Retry up to 3 times
+                revised_response = await call_llm_async(
+                    prompt=fix_sql_prompt,
+                    parser=fix_sql_parser,
+                    variables=_fix_sql_variables(state, last_error),
+                    llm=llm
+                )
+                revised_query = revised_response.sql_query
+                try:
+                    df = await run_and_validate_query(revised_query)
+                    state["sql_query"] = revised_query
+                    break
+                except Exception as second_error:
+                    raise_if_cancelled(second_error)
+                    last_error = str(second_error)
+            else:
+                raise RuntimeError(f"SQL retry also failed: {last_error}")
+
+        state["df_raw"] = df
+        return state
+
+    return RunnableLambda(node, afunc=anode)
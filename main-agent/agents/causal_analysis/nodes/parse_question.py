@@ -10,7 +10,7 @@ from prompts.causal_agent_prompts import parse_query_prompt, parse_query_parser
 from langchain_core.runnables import RunnableLambda
 from langchain_core.language_models.chat_models import BaseChatModel
 
-from utils.redis_client import redis_client
+from utils.metadata_registry import load_metadata
 
 def build_parse_question_node(llm: BaseChatModel) -> Callable:
     def _parse_question(state: Dict) -> Dict:
@@ -21,24 +21,16 @@ def build_parse_question_node(llm: BaseChatModel) -> Callable:
         question = state["input"] # Case 2: natural language question is provided
         db_id = state["db_id"]
 
-        # Redis에서 저장된 테이블 리스트 불러오기
-        table_keys = redis_client.keys(f"{db_id}:metadata:*")
+        # Redis에서 저장된 테이블 메타데이터 불러오기 (table_names set + 한 번의 MGET)
         table_markdowns = []
 
-        for key in table_keys:
-            if key == f"{db_id}:metadata:table_names":
-                continue
-            table_name = key.split(":")[2]
-            raw = redis_client.get(key)
-            if not raw:
-                continue
+        for table_name, metadata in load_metadata(prefix=f"{db_id}:metadata").items():
             try:
-                metadata = json.loads(raw)
                 schema = metadata.get("schema", {})
                 markdown = generate_table_markdown({table_name: schema})
                 table_markdowns.append(markdown)
             except Exception as e:
-                print(f"⚠️ Error parsing metadata for key {key}: {e}")
+                print(f"⚠️ Error parsing metadata for table {table_name}: {e}")
 
         full_markdown = "\n\n".join(table_markdowns)
         table_metadata, primary_keys = extract_table_metadata(table_markdowns)
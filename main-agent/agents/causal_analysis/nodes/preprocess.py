@@ -3,7 +3,7 @@
 import pandas as pd
 from typing import Dict, List
 from sklearn.preprocessing import StandardScaler
-from utils.assist_preprocessing import drop_nulls, normalize_covariates
+from utils.assist_preprocessing import drop_nulls, normalize_covariates, to_numpy_dtypes
 
 
 def build_preprocess_node():
@@ -17,8 +17,9 @@ def build_preprocess_node():
             raise ValueError("Missing 'df_raw' or 'causal_graph.nodes'.")
 
         selected_cols = [var.split(".")[-1] for var in graph_nodes]
-        df = df[selected_cols].copy()
+        df = to_numpy_dtypes(df[selected_cols].copy())
 
+        # 남은 object 컬럼 (fetchall 결과 또는 텍스트) 은 숫자 → 실패 시 category 로 변환
         for col in df.columns:
             if df[col].dtype == object:
                 try:
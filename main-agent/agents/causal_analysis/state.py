@@ -53,6 +53,8 @@ class CausalAnalysisState(BaseModel):
     table_schema_str: Optional[str] = None  # Markdown-formatted table schema for SQL generation
     
     sql_query: Optional[str] = None  # SQL 쿼리
+    sampling: Optional[Dict[str, Any]] = None  # 샘플링 설정 (method, target_rows, seed, stratify, key_column)
+    sample_info: Optional[Dict[str, Any]] = None  # 실제 적용된 샘플링 (method, seed, fraction, sample_size, sampled_sql)
     df_raw: Optional[pd.DataFrame] = None  # 추출된 원본 데이터
     df_preprocessed: Optional[pd.DataFrame] = None  # 전처리된 데이터
     label_maps: Optional[Dict[str, Dict[int, str]]] = None  # 범주형 변수 인코딩 정보 (숫자 → 레이블 매핑)
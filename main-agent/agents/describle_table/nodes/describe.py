@@ -1,9 +1,8 @@
-import json
 
 from prompts.describe_table_prompts import column_description_prompt as prompt, column_description_parser as parser, TableAnalysis
 from data_prep.metadata import generate_table_markdown, update_metadata
 from utils.llm import call_llm
-from utils.redis_client import redis_client
+from utils.metadata_registry import get_table_metadata
 from langchain_core.language_models.chat_models import BaseChatModel
 
 # -------------------------------
@@ -12,12 +11,10 @@ from langchain_core.language_models.chat_models import BaseChatModel
 def describe_table(table_name: str, llm: BaseChatModel) -> TableAnalysis:
     try:
         # Redis에서 schema 정보 불러오기
-        redis_key = f"metadata:{table_name}"
-        raw = redis_client.get(redis_key)
-        if not raw:
+        metadata = get_table_metadata(table_name)
+        if not metadata:
             raise ValueError(f"Error: No metadata found in Redis for table: {table_name}")
-        
-        metadata = json.loads(raw)
+
         schema = metadata.get("schema")
         if not schema:
             raise ValueError(f"Error: No 'schema' field found for table: {table_name}")
@@ -1,32 +1,102 @@
-import json
-from utils.redis_client import redis_client
-from data_prep.related_tables import update_table_relations_sync
+import os
+import time
+import uuid
+import atexit
+import threading
+from utils.redis_client import redis_bytes_client
+from utils.metadata_registry import metadata_cache
+from data_prep.related_tables import (
+    update_table_relations, get_table_relations, TABLE_RELATIONS_REFRESHED_AT_KEY
+)
+
+TABLE_RELATIONS_TTL = float(os.getenv("TABLE_RELATIONS_TTL", 3600))  # seconds before a background refresh
+REFRESH_LOCK_KEY = "table_relations:refresh_lock"
+REFRESH_LOCK_TTL = int(os.getenv("TABLE_RELATIONS_REFRESH_LOCK_TTL", 60))  # renewed while the refresh runs
+
+_lock_token = None  # this process's lock value while it holds the refresh lock
+_lock_stop = threading.Event()
+
+# -------------------------------
+# cached relations graph + background refresher
+# -------------------------------
+def _release_lock():
+    global _lock_token
+    _lock_stop.set()
+    token, _lock_token = _lock_token, None
+    # 다른 프로세스가 만료 후 새로 잡은 lock 은 지우지 않음
+    if token is not None and redis_bytes_client.get(REFRESH_LOCK_KEY) == token:
+        redis_bytes_client.delete(REFRESH_LOCK_KEY)
+
+def _renew_lock(token: bytes):
+    # refresh 가 도는 동안 TTL 갱신 → 프로세스가 죽으면 최대 REFRESH_LOCK_TTL 후 다른 프로세스가 이어받음
+    while not _lock_stop.wait(REFRESH_LOCK_TTL / 3):
+        if redis_bytes_client.get(REFRESH_LOCK_KEY) != token:
+            return
+        redis_bytes_client.expire(REFRESH_LOCK_KEY, REFRESH_LOCK_TTL)
+
+def _refresh_worker():
+    try:
+        update_table_relations()
+    except Exception as e:
+        print(f"⚠️ Background table_relations refresh failed: {e}")
+    finally:
+        _release_lock()
+
+def refresh_relations_in_background() -> bool:
+    """Starts one refresh across all processes (Redis lock); returns False if one is already running."""
+    global _lock_token
+    token = f"{os.getpid()}:{uuid.uuid4().hex}".encode()
+    if not redis_bytes_client.set(REFRESH_LOCK_KEY, token, nx=True, ex=REFRESH_LOCK_TTL):
+        return False
+    _lock_token = token
+    _lock_stop.clear()
+    threading.Thread(target=_renew_lock, args=(token,), name="table_relations_refresh_lock", daemon=True).start()
+    threading.Thread(target=_refresh_worker, name="table_relations_refresh", daemon=True).start()
+    return True
+
+# 인터프리터 종료 시 daemon thread 는 finally 없이 끝나므로 lock 을 여기서 해제
+atexit.register(_release_lock)
+
+def load_table_relations(table_name: str) -> dict:
+    """
+    Cached relations of one table (outbound/inbound edges). Stored relations are served even when
+    they are stale or carry no refresh timestamp (e.g. written by an older version); in that case a
+    background refresh is started. Kept in-process until the metadata version changes.
+    """
+    refreshed_at = redis_bytes_client.get(TABLE_RELATIONS_REFRESHED_AT_KEY)
+    if refreshed_at is None or time.time() - float(refreshed_at) > TABLE_RELATIONS_TTL:
+        refresh_relations_in_background()
+
+    cache_name = f"table_relations:{table_name}"
+    entry = metadata_cache.get_or_load(cache_name, lambda: get_table_relations([table_name]).get(table_name))
+    if entry is None:
+        metadata_cache.discard(cache_name)  # 없는 테이블은 캐시하지 않음
+        if refreshed_at is None:
+            print("table_relations not built yet; refreshing in the background.")
+        return {}
+    return entry
 
 # -------------------------------
 # related_tables_node
 # -------------------------------
-def get_related_graph(graph: dict, table_name: str) -> dict:
+def get_related_graph(relations: dict) -> dict:
     related = {}
     # outbound
-    for to_table in graph["edges"].get(table_name, []):
-        key = f"{table_name}→{to_table}"
-        edge_data = graph.get("edge_reasons", {}).get(key, [])
+    for to_table in relations.get("edges", []):
+        edge_data = relations.get("outbound", {}).get(to_table, [])
         reasons = [d.get("reason", "No reason found") for d in edge_data]
         related[to_table] = "\n".join(reasons) if reasons else "No reason found"
     # inbound
-    for from_table, to_tables in graph["edges"].items():
-        if table_name in to_tables:
-            key = f"{from_table}→{table_name}"
-            edge_data = graph.get("edge_reasons", {}).get(key, [])
-            reasons = [d.get("reason", "No reason found") for d in edge_data]
-            related[from_table] = "\n".join(reasons) if reasons else "No reason found"
+    for from_table, edge_data in relations.get("inbound", {}).items():
+        reasons = [d.get("reason", "No reason found") for d in edge_data]
+        related[from_table] = "\n".join(reasons) if reasons else "No reason found"
     return related
 
 def related_tables(table_name: str) -> str:
-    update_table_relations_sync()
-    graph_raw = redis_client.get("table_relations")
-    graph = json.loads(graph_raw) if graph_raw else {}
-    related = get_related_graph(graph, table_name)
+    relations = load_table_relations(table_name)
+    if not relations:
+        return {}
+    related = get_related_graph(relations)
     return related
 
 def related_tables_node(state):
@@ -1,20 +1,16 @@
-import json
 import datetime
 import graphviz
-from utils.redis_client import redis_client
+from utils.metadata_registry import load_metadata
+from utils.table_names import foreign_key_edges
 
 
 def generate_erd(state):
     recommended = state["recommended_tables"]
-    metadata = {}
-    for table in recommended:
-        redis_key = f"metadata:{table}"
-        try:
-            raw = redis_client.get(redis_key)
-            if raw:
-                metadata[table] = json.loads(raw)
-        except Exception as e:
-            print(f"ERROR: Failed to load metadata for {table}: {e}")
+    try:
+        metadata = load_metadata(recommended)
+    except Exception as e:
+        print(f"ERROR: Failed to load metadata for {recommended}: {e}")
+        metadata = {}
 
     erd = graphviz.Digraph(format='png')
     erd.attr('node', shape='plaintext')
@@ -36,20 +32,17 @@ def generate_erd(state):
         >"""
         erd.node(table, label=label)
 
-    for src_table, data in metadata.items():
-        for col, info in data["schema"]["columns"].items():
-            if "fk" in info:
-                fk_target = info["fk"]
-                ref_table, ref_col = fk_target.split(".")
-                modality = "odot" if info.get("nullable", True) else "tee"
-                cardinality = "crow" if not info.get("unique", False) and not info.get("pk", False) else "none"
-                erd.edge(
-                    ref_table,
-                    src_table,
-                    arrowtail=modality,
-                    arrowhead=cardinality,
-                    dir="both"
-                )
+    # fk 는 "table.col" 또는 "schema.table.col"
+    for ref_table, src_table, info in foreign_key_edges(metadata):
+        modality = "odot" if info.get("nullable", True) else "tee"
+        cardinality = "crow" if not info.get("unique", False) and not info.get("pk", False) else "none"
+        erd.edge(
+            ref_table,
+            src_table,
+            arrowtail=modality,
+            arrowhead=cardinality,
+            dir="both"
+        )
 
     output_path = f"./outputs/images/erd/{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
     erd.render(output_path, cleanup=True)
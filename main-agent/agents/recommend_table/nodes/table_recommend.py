@@ -7,7 +7,8 @@ from langchain_openai import OpenAIEmbeddings
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from utils.llm import call_llm
-from utils.redis_client import redis_client
+from utils.redis_client import redis_bytes_client
+from utils import metadata_registry
 from prompts.recommend_table_analysis_prompt import prompt, parser
 
 from pathlib import Path
@@ -16,14 +17,9 @@ load_dotenv(dotenv_path=Path(__file__).parents[1] / ".env")
 
 
 def load_metadata(redis_client, redis_key="metadata") -> list[Document]:
-    table_names = redis_client.smembers(f"{redis_key}:table_names")
     documents = []
-    for table in table_names:
-        raw = redis_client.get(f"{redis_key}:{table}")
-        if not raw:
-            continue
+    for table, meta in metadata_registry.load_metadata(prefix=redis_key, client=redis_client).items():
         try:
-            meta = json.loads(raw)
             desc = meta.get("description", "")
             usage = " ".join(meta.get("sample_usage", []))
             doc_text = f"{desc}\nUse Cases: {usage}"
@@ -33,7 +29,7 @@ def load_metadata(redis_client, redis_key="metadata") -> list[Document]:
     return documents
 
 
-def get_table_candidates(query: str, k: int = 15, redis_client=redis_client) -> str:
+def get_table_candidates(query: str, k: int = 15, redis_client=redis_bytes_client) -> str:
     documents = load_metadata(redis_client)
     vectorstore = FAISS.from_documents(documents, OpenAIEmbeddings())
     top_k_docs = vectorstore.similarity_search(query, k=k)
@@ -1,25 +1,39 @@
+from functools import partial
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from langchain_core.language_models.chat_models import BaseChatModel
 
 from .state import AgentState
 from .nodes.selector import selector_node
 from .nodes.decomposer import decomposer_node
-from .nodes.refiner import refiner_node
+from .nodes.refiner import refiner_node, refiner_node_async
 from .nodes.review import review_node
 from .nodes.system import system_node
+from .nodes.cache import cache_lookup_node, cache_store_node
     
 
 def router(state: AgentState):
     return state['send_to']
 
-def generate_text2sql_graph():
+def generate_text2sql_graph(llm: BaseChatModel = None):
     graph = StateGraph(AgentState)
-    graph.set_entry_point('selector_node') 
-    graph.add_node('selector_node', selector_node)
-    graph.add_node('decomposer_node', decomposer_node) # task 분해하여 sql 생성
-    graph.add_node('refiner_node', refiner_node) # sql 실행 및 에러 해결
-    graph.add_node('review_node', review_node)
+    graph.set_entry_point('cache_lookup_node')
+    graph.add_node('cache_lookup_node', cache_lookup_node)  # 의미상 같은 질문이면 검증된 SQL 재사용
+    graph.add_node('selector_node', partial(selector_node, llm=llm))
+    graph.add_node('decomposer_node', partial(decomposer_node, llm=llm)) # task 분해하여 sql 생성
+    # sql 실행 및 에러 해결 (graph.ainvoke 에서는 async 버전 사용)
+    graph.add_node('refiner_node', RunnableLambda(
+        partial(refiner_node, llm=llm),
+        afunc=partial(refiner_node_async, llm=llm)
+    ))
+    graph.add_node('review_node', partial(review_node, llm=llm))
+    graph.add_node('cache_store_node', cache_store_node)  # 리뷰를 통과한 SQL 을 캐시에 저장
     graph.add_node('system_node', system_node)
 
+    graph.add_conditional_edges('cache_lookup_node', router, {
+        'selector_node': 'selector_node',
+        'system_node': 'system_node',
+    })
     graph.add_conditional_edges('selector_node', router, {
         'decomposer_node': 'decomposer_node',
     })
@@ -33,7 +47,10 @@ def generate_text2sql_graph():
 
     graph.add_conditional_edges('review_node', router, {
             'refiner_node': 'refiner_node',
-            'system_node': 'system_node',
+            'system_node': 'cache_store_node',
+    })
+    graph.add_conditional_edges('cache_store_node', router, {
+        'system_node': 'system_node',
     })
 
     graph.add_conditional_edges('system_node', lambda s: END, {END: END})
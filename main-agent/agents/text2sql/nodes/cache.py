@@ -0,0 +1,69 @@
+from utils.database import Database
+from utils.semantic_cache import get_semantic_cache
+from .refiner import NO_ROWS_RESULT
+
+database = Database()
+
+REVIEW_PASSED = "✅"
+
+
+def cache_lookup_node(state):
+    """
+    Semantic cache lookup before the selector: a paraphrase of an already answered question reuses
+    its validated SQL, runs it and goes straight to the system node (no decomposer / refiner / review).
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return {**state, 'send_to': 'selector_node'}
+
+    db_id, query = state['db_id'], state['query']
+    try:
+        embedding = cache.embed(query)
+        hit = cache.lookup(db_id, embedding)
+    except Exception as e:
+        print(f"⚠️ Semantic cache lookup failed: {e}")
+        return {**state, 'send_to': 'selector_node'}
+
+    if hit is None:
+        return {**state, 'query_embedding': embedding, 'send_to': 'selector_node'}
+
+    print(f"Semantic cache hit ({hit['score']:.3f}): {hit['question']}")
+    # 캐시에는 SQL 만 있으므로 hit 이어도 실행해서 현재 데이터 기준 결과를 돌려줌
+    try:
+        print("Executing cached SQL....")
+        result, columns = database.run_query(sql=hit['sql'], db_id=db_id, readonly=True)
+    except Exception as e:
+        # 캐시된 SQL 이 더 이상 실행되지 않음 → 항목 삭제 후 일반 경로로
+        print("Cached SQL failed, generating a new one:", e)
+        cache.remove(db_id, hit['question'])
+        return {**state, 'query_embedding': embedding, 'send_to': 'selector_node'}
+
+    cached = {
+        **state,
+        'final_sql': hit['sql'],
+        'pred': None,
+        'cache_hit': True,
+        'error': None,
+        'llm_review': f"{REVIEW_PASSED} Reused the reviewed SQL of a similar question: {hit['question']}",
+        'send_to': 'system_node',
+    }
+    if not result:
+        # refiner 와 같은 형태: 결과 대신 안내 메시지
+        return {**cached, 'result': NO_ROWS_RESULT}
+    return {**cached, 'result': result, 'columns': columns}
+
+
+def cache_store_node(state):
+    """Stores the SQL of an answer that passed review (and was not itself served from the cache)."""
+    cache = get_semantic_cache()
+    review = state.get('llm_review') or ""
+    if cache is None or state.get('cache_hit') or state.get('error') or not review.startswith(REVIEW_PASSED):
+        return {**state, 'send_to': 'system_node'}
+
+    sql = state.get('pred') or state.get('final_sql')
+    try:
+        embedding = state.get('query_embedding') or cache.embed(state['query'])
+        cache.add(state['db_id'], state['query'], embedding, sql)
+    except Exception as e:
+        print(f"⚠️ Semantic cache store failed: {e}")
+    return {**state, 'send_to': 'system_node'}
@@ -1,10 +1,66 @@
 from prompts.text2sql_prompts import refiner_template, refiner_feedback_template
-from utils.llm import call_llm
+from utils.llm import call_llm, call_llm_async
 from utils.parsers import parse_sql_from_string
-from utils.database import run_postgres_query
+from utils.database import Database, QueryTimeoutError
 
 from langchain_core.language_models.chat_models import BaseChatModel
 
+database = Database()
+
+# 실행은 성공했지만 반환된 결과가 없을 때 result 로 전달되는 메시지 (semantic cache hit 경로도 동일하게 사용)
+NO_ROWS_RESULT = "Sql executed but no rows returned, there might be something wrong with the sql or no data in the table that matches the query."
+
+
+def _feedback_prompt(state):
+    return refiner_feedback_template.format(
+        query=state['query'],
+        evidence=state.get('evidence'),
+        desc_str=state['desc_str'],
+        fk_str=state['fk_str'],
+        sql=state['final_sql'],
+        review_feedback=state.get('llm_review')
+    )
+
+
+def _error_prompt(state, error_info):
+    return refiner_template.format(
+        query=state['query'],
+        evidence=state.get('evidence'),
+        desc_str=state['desc_str'],
+        fk_str=state['fk_str'],
+        sql=error_info['sql'],
+        sql_error=error_info.get('error', ''),
+        exception_class=error_info.get('exception_class', '')
+    )
+
+
+def _executed(state, result, columns):
+    if result and len(result) > 0:
+        return {
+            **state,
+            'result': result,
+            'columns': columns,  # SQL 실행 후 컬럼명 저장
+            'error': None,  # 에러 초기화
+            'send_to': 'review_node'
+        }
+    # 실행은 성공했지만 반환된 결과가 없는 경우
+    return {
+        **state,
+        'result': NO_ROWS_RESULT,
+        'error': None,  # 에러 초기화
+        'send_to': 'review_node'
+    }
+
+
+def _refined(state, llm_reply, try_times):
+    return {
+        **state,
+        'pred': parse_sql_from_string(llm_reply),
+        'try_times': try_times + 1,
+        'send_to': 'refiner_node',
+        # 'llm_review': None  # 한 번 반영했으니 초기화
+    }
+
 
 def refiner_node(state, llm: BaseChatModel):
     db_id = state['db_id']
@@ -13,77 +69,68 @@ def refiner_node(state, llm: BaseChatModel):
     try_times = state.get('try_times', 0)
 
     if llm_review and try_times == 0:
-        error_info = state.get('error', {})
-        
         print("Refining SQL with feedback...")
-        prompt = refiner_feedback_template.format(
-            query=state['query'],
-            evidence=state.get('evidence'),
-            desc_str=state['desc_str'],
-            fk_str=state['fk_str'],
-            sql=state['final_sql'],
-            review_feedback=llm_review
-        )
-        
-        llm_reply = call_llm(prompt, llm=llm)
-        new_sql = parse_sql_from_string(llm_reply)
+        llm_reply = call_llm(_feedback_prompt(state), llm=llm)
+        return _refined(state, llm_reply, try_times)
 
+    try:
+        # 실행 전에 EXPLAIN 으로 비용 확인 → 초과 시 QueryCostError (plan 요약이 에러 컨텍스트로 전달됨)
+        database.check_query_cost(sql=sql, db_id=db_id, readonly=True)
+        print("Executing SQL....")
+        result, columns = database.run_query(sql=sql, db_id=db_id, readonly=True)
+        return _executed(state, result, columns)
+    except QueryTimeoutError as e:
+        print("SQL timed out:", e)
+        if e.cancelled:  # watchdog 가 취소한 경우 재시도하지 않음
+            return {**state, 'error': str(e), 'send_to': 'review_node'}
+        error_info = {'sql': sql, 'error': str(e), 'exception_class': type(e).__name__}
+    except Exception as e:
+        print("Error executing SQL:", e)
+        error_info = {'sql': sql, 'error': str(e), 'exception_class': type(e).__name__}
+
+    if try_times >= 3:
         return {
             **state,
-            'pred': new_sql,
-            'try_times': try_times + 1,
-            'send_to': 'refiner_node',
-            # 'llm_review': None  # 한 번 반영했으니 초기화
+            'error': error_info['error'],
+            'send_to': 'review_node'
         }
 
-    else:
-        try:
-            print("Executing SQL....")
-            result, columns = run_postgres_query(db_id, sql)
-            if result and len(result) > 0:
-                return {
-                    **state,
-                    'result': result,
-                    'columns': columns,  # SQL 실행 후 컬럼명 저장
-                    'error': None,  # 에러 초기화
-                    'send_to': 'review_node'
-                }
-            else: # 실행은 성공했지만 반환된 결과가 없는 경우
-                return {
-                    **state,
-                    'result': "Sql executed but no rows returned, there might be something wrong with the sql or no data in the table that matches the query.",
-                    'error': None,  # 에러 초기화
-                    'send_to': 'review_node'
-                }
-                
-        except Exception as e:
-            print("Error executing SQL:", e)
-            error_info = {'sql': sql, 'error': str(e), 'exception_class': type(e).__name__}
-
-        if try_times >= 3:
-            return {
-                **state,
-                'error': error_info['error'],
-                'send_to': 'review_node'
-            }
-    
-        prompt = refiner_template.format(
-            query=state['query'],
-            evidence=state.get('evidence'),
-            desc_str=state['desc_str'],
-            fk_str=state['fk_str'],
-            sql=error_info['sql'],
-            sql_error=error_info.get('error', ''),
-            exception_class=error_info.get('exception_class', '')
-        )
-
-        llm_reply = call_llm(prompt)
-        new_sql = parse_sql_from_string(llm_reply)
+    llm_reply = call_llm(_error_prompt(state, error_info))
+    return _refined(state, llm_reply, try_times)
+
+
+async def refiner_node_async(state, llm: BaseChatModel):
+    """Async variant of `refiner_node` (asyncpg pool + async LLM calls) for graph.ainvoke."""
+    db_id = state['db_id']
+    sql = state.get('pred') or state.get('final_sql')
+    llm_review = state.get('llm_review')
+    try_times = state.get('try_times', 0)
 
+    if llm_review and try_times == 0:
+        print("Refining SQL with feedback...")
+        llm_reply = await call_llm_async(_feedback_prompt(state), llm=llm)
+        return _refined(state, llm_reply, try_times)
+
+    try:
+        await database.check_query_cost_async(sql=sql, db_id=db_id, readonly=True)
+        print("Executing SQL....")
+        result, columns = await database.run_query_async(sql=sql, db_id=db_id, readonly=True)
+        return _executed(state, result, columns)
+    except QueryTimeoutError as e:
+        print("SQL timed out:", e)
+        if e.cancelled:  # watchdog 가 취소한 경우 재시도하지 않음
+            return {**state, 'error': str(e), 'send_to': 'review_node'}
+        error_info = {'sql': sql, 'error': str(e), 'exception_class': type(e).__name__}
+    except Exception as e:
+        print("Error executing SQL:", e)
+        error_info = {'sql': sql, 'error': str(e), 'exception_class': type(e).__name__}
+
+    if try_times >= 3:
         return {
             **state,
-            'pred': new_sql,
-            'try_times': try_times + 1,
-            'send_to': 'refiner_node',
-            # 'llm_review': None  # 한 번 반영했으니 초기화
-        }
\ No newline at end of file
+            'error': error_info['error'],
+            'send_to': 'review_node'
+        }
+
+    llm_reply = await call_llm_async(_error_prompt(state, error_info))
+    return _refined(state, llm_reply, try_times)
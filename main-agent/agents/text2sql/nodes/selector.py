@@ -1,9 +1,8 @@
-import json
 from typing import Dict, Any
 from prompts.text2sql_prompts import selector_template
 from utils.llm import call_llm
 from utils.parsers import parse_json_from_string
-from utils.redis_client import redis_client
+from utils.metadata_registry import load_metadata
 
 from langchain_core.language_models.chat_models import BaseChatModel
 
@@ -80,14 +79,9 @@ def selector_node(state, llm: BaseChatModel):
     """
     db_id = state['db_id']
 
-    table_names = redis_client.smembers("metadata:table_names")
     schema_tables = []
     fk_lines = []
-    for tablename in sorted(table_names):
-        meta_json = redis_client.get(f"metadata:{tablename}")
-        if not meta_json:
-            continue
-        meta = json.loads(meta_json)
+    for tablename, meta in load_metadata().items():
         schema_dict = extract_metadata(tablename, meta)
         for fk in meta.get("schema", {}).get("foreign_keys", []):
             from_col, to_table, to_col = fk
@@ -17,5 +17,8 @@ class AgentState(TypedDict):
     llm_review: Optional[str]  # 리뷰 노드에서 사용
     output: Optional[dict]  # system_node 에서 사용
     
+    cache_hit: Optional[bool]  # semantic cache 에서 SQL 을 재사용한 경우
+    query_embedding: Optional[List[float]]  # cache_lookup_node 에서 계산, cache_store_node 에서 재사용
+
     db_id: str # 여러 db 를 쓸 경우
     notes: Optional[str] # 노트는 사용자가 입력한 추가 정보나 힌트
\ No newline at end of file
@@ -1,5 +1,5 @@
 from typing import Union, Any, overload
-from langchain_openai import ChatOpenAI
+from utils.llm import get_llm
 from langchain_core.prompts import BasePromptTemplate
 from langchain_core.output_parsers import BaseOutputParser
 
@@ -26,7 +26,7 @@ def call_llm(
     - PromptTemplate → str output
     - PromptTemplate + Parser → structured output (e.g., BaseModel, dict, list)
     """
-    llm = ChatOpenAI(model=model, temperature=temperature)
+    llm = get_llm(model=model, temperature=temperature)
 
     # Case 1: PromptTemplate with parser
     if isinstance(prompt, BasePromptTemplate) and parser:
@@ -52,40 +52,16 @@ def call_llm(
 
 
 import json 
-import psycopg2
 import re
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-load_dotenv("/root/limlab01/llm-masters/llm-masters/.env")
-    
-# 나중에 load 하는 코드로 수정
-DB_CONFIG = {
-    "host": "localhost",
-    "port": 5432,
-    "dbname": "daa", # 수정
-    "user": "postgres", # 수정
-    "password": os.getenv("POSTGRES_PASSWORD") 
-}
+from utils.database import Database
 
+database = Database()
 
-# ------------------------ DB 유틸 ------------------------
-def get_pg_conn(db_id=None):
-    return psycopg2.connect(
-        host=DB_CONFIG["host"],
-        port=DB_CONFIG["port"],
-        dbname=db_id or DB_CONFIG["dbname"],
-        user=DB_CONFIG["user"],
-        password=DB_CONFIG["password"]
-    )
 
+# ------------------------ DB 유틸 ------------------------
+# 연결/풀 관리는 utils.database.Database 로 일원화
 def run_postgres_query(db_id: str, sql: str):
-    conn = get_pg_conn(db_id)
-    cur = conn.cursor()
-    cur.execute(sql)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    rows, _ = database.run_query(sql=sql, db_id=db_id)
     print("successfully executed SQL!:", rows)
     return rows
 
@@ -0,0 +1,113 @@
+# data_prep/change_tracking.py
+# Per-table change detection for incremental metadata refresh:
+# structural schema hash + pg_stat_user_tables activity counters, stored in Redis.
+import os
+import json
+import hashlib
+from typing import Dict, List
+
+from utils.redis_client import redis_client
+from utils.database import Database
+from .related_tables import table_name, schema_filter
+
+database = Database()
+
+TABLE_STATE_KEY = "table_state"  # Redis hash: table → {"structure_hash", "activity"}
+CHANGE_THRESHOLD = float(os.getenv("METADATA_CHANGE_THRESHOLD", 0.05))  # modified rows / live rows to re-profile
+
+STRUCTURE_FIELDS = ("type", "nullable", "default", "pk", "unique", "fk")
+
+
+def structure_hash(table_schema: dict) -> str:
+    """Hash of the structural part of a table schema (columns, keys, constraints — no stats)."""
+    structure = {
+        "columns": {
+            col: {field: meta.get(field) for field in STRUCTURE_FIELDS}
+            for col, meta in table_schema["columns"].items()
+        },
+        "primary_key": table_schema.get("primary_key", []),
+        "foreign_keys": [list(fk) for fk in table_schema.get("foreign_keys", [])],
+        "check_constraints": table_schema.get("check_constraints", []),
+    }
+    raw = json.dumps(structure, sort_keys=True, default=str).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def get_table_activity() -> Dict[str, dict]:
+    """
+    pg_stat_user_tables counters per table of the extracted schemas. Read from the primary:
+    activity statistics are per server, a replica does not see the primary's writes here.
+    """
+    condition, params = schema_filter("schemaname")
+    with database.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT schemaname, relname, n_tup_ins, n_tup_upd, n_tup_del, n_live_tup,
+                       GREATEST(last_analyze, last_autoanalyze)
+                FROM pg_stat_user_tables
+                WHERE {condition}
+                ORDER BY schemaname, relname;
+            """, params)
+            return {
+                table_name(schema, relname): {
+                    "n_tup_ins": ins,
+                    "n_tup_upd": upd,
+                    "n_tup_del": dele,
+                    "n_live_tup": live,
+                    "last_analyze": last_analyze.isoformat() if last_analyze else None,
+                }
+                for schema, relname, ins, upd, dele, live, last_analyze in cursor.fetchall()
+            }
+
+
+def load_table_states() -> Dict[str, dict]:
+    return {table: json.loads(state) for table, state in redis_client.hgetall(TABLE_STATE_KEY).items()}
+
+
+def _data_changed(previous: dict, current: dict, threshold: float, track_analyze: bool) -> bool:
+    modified = sum(current[k] - previous.get(k, 0) for k in ("n_tup_ins", "n_tup_upd", "n_tup_del"))
+    if modified < 0:  # 통계가 리셋됨 (pg_stat_reset / 서버 재시작) → 변경 여부를 알 수 없으므로 다시 프로파일링
+        return True
+    if modified / max(previous.get("n_live_tup", 0), 1) >= threshold:
+        return True
+    # catalog 모드의 통계는 ANALYZE 시점에 바뀜
+    return track_analyze and current["last_analyze"] != previous.get("last_analyze")
+
+
+def detect_changes(structures: Dict[str, dict], activity: Dict[str, dict], threshold: float = CHANGE_THRESHOLD,
+                   track_analyze: bool = False) -> Dict[str, List[str]]:
+    """
+    Classifies tables against the stored state:
+    - "structure": new tables or structural changes → re-profile and regenerate LLM metadata
+    - "data": modified rows ≥ `threshold` of live rows (or a new ANALYZE with `track_analyze`) → re-profile only
+    - "unchanged": nothing to do
+    - "removed": tracked tables that no longer exist
+    `structures` are structure-only table schemas (`introspect_tables`).
+    """
+    states = load_table_states()
+    changes = {"structure": [], "data": [], "unchanged": [], "removed": sorted(set(states) - set(structures))}
+    for table in sorted(structures):
+        state = states.get(table)
+        current = activity.get(table, {})
+        if state is None or state["structure_hash"] != structure_hash(structures[table]):
+            changes["structure"].append(table)
+        elif current and _data_changed(state.get("activity", {}), current, threshold, track_analyze):
+            changes["data"].append(table)
+        else:
+            changes["unchanged"].append(table)
+    return changes
+
+
+def record_table_states(schema: Dict[str, dict], activity: Dict[str, dict]):
+    """Stores the structure hash and activity counters of freshly profiled tables."""
+    if not schema:
+        return
+    redis_client.hset(TABLE_STATE_KEY, mapping={
+        table: json.dumps({"structure_hash": structure_hash(table_schema), "activity": activity.get(table, {})})
+        for table, table_schema in schema.items()
+    })
+
+
+def forget_tables(tables: List[str]):
+    if tables:
+        redis_client.hdel(TABLE_STATE_KEY, *tables)
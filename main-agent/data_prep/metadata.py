@@ -1,10 +1,26 @@
 from typing import Dict
-import json
+import os
+import hashlib
+import asyncio
 
-from config.redis import redis_client
-from utils.llm import call_llm
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
+
+from utils import codec
+from utils.redis_client import redis_bytes_client
+from utils.llm import call_llm, call_llm_async
+from utils.rate_limiter import AsyncRateLimiter, estimate_tokens
+from utils.metadata_registry import bump_metadata_version
 from prompts.metadata_prompt import prompt, parser
 
+METADATA_HASH_KEY = "metadata_hash"  # Redis hash: table → sha256 of the markdown its metadata was generated from
+
+# 배치 생성 설정 (LLM 제공자 한도에 맞게 조정)
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", 8))
+METADATA_RPM = int(os.getenv("METADATA_RPM", 500)) or None  # requests / minute, 0 = unlimited
+METADATA_TPM = int(os.getenv("METADATA_TPM", 200000)) or None  # tokens / minute, 0 = unlimited
+METADATA_MAX_ATTEMPTS = int(os.getenv("METADATA_MAX_ATTEMPTS", 4))
+METADATA_OUTPUT_TOKENS = 1000  # budgeted completion tokens per table
+
 
 # 테이블 구조 markdown 생성 (LLM 입력용)
 def generate_table_markdown(sub_schema: Dict[str, dict]) -> str:
@@ -21,22 +37,24 @@ def generate_table_markdown(sub_schema: Dict[str, dict]) -> str:
             if meta.get("nullable") is False: parts.append("NOT NULL")
             if meta.get("default") is not None: parts.append(f"DEFAULT {meta['default']}")
 
-            # +) 통계 정보
-            if "count" in meta: parts.append(f"count={meta['count']}")
-            if "nulls" in meta: parts.append(f"nulls={meta['nulls']}")
-            if "distinct" in meta: parts.append(f"distinct={meta['distinct']}")
+            # +) 통계 정보 (근사값은 "≈" 로 표시)
+            approx = set(meta.get("approximate", []))
+            eq = lambda key: "≈" if key in approx else "="
+            if "count" in meta: parts.append(f"count{eq('count')}{meta['count']}")
+            if "nulls" in meta: parts.append(f"nulls{eq('nulls')}{meta['nulls']}")
+            if "distinct" in meta: parts.append(f"distinct{eq('distinct')}{meta['distinct']}")
             if "min" in meta and "max" in meta:
-                parts.append(f"range={meta['min']}~{meta['max']}")
-            if "avg" in meta: parts.append(f"avg={meta['avg']}")
-            if "stddev" in meta: parts.append(f"stddev={meta['stddev']}")
-            if "median" in meta: parts.append(f"median={meta['median']}")
+                parts.append(f"range{eq('min')}{meta['min']}~{meta['max']}")
+            if "avg" in meta: parts.append(f"avg{eq('avg')}{meta['avg']}")
+            if "stddev" in meta: parts.append(f"stddev{eq('stddev')}{meta['stddev']}")
+            if "median" in meta: parts.append(f"median{eq('median')}{meta['median']}")
 
             lines.append("- " + ", ".join(parts))
 
             # +) top_values, examples
             if "top_values" in meta:
                 top = ", ".join([f"{k}({v})" for k, v in meta["top_values"].items()])
-                parts.append(f"top_values={top}")
+                parts.append(f"top_values{eq('top_values')}{top}")
             if "examples" in meta:
                 examples = ", ".join(meta["examples"])
                 parts.append(f"examples=[{examples}]")
@@ -49,26 +67,129 @@ def generate_table_markdown(sub_schema: Dict[str, dict]) -> str:
     return "\n".join(lines)
 
 
+def markdown_hash(schema_md: str) -> str:
+    return hashlib.sha256(schema_md.encode()).hexdigest()
+
+
 # 테이블 하나에 대한 메타데이터 생성
-def generate_metadata(table_name: str, schema: dict) -> dict:
-    schema_md = generate_table_markdown({table_name: schema})
-    result = call_llm(prompt=prompt, parser=parser, variables={"schema": schema_md})
+def generate_metadata(table_name: str, schema: dict, schema_md: str = None, cache: bool = True) -> dict:
+    schema_md = schema_md or generate_table_markdown({table_name: schema})
+    result = call_llm(prompt=prompt, parser=parser, variables={"schema": schema_md}, cache=cache)
     metadata = result.model_dump()
     metadata["schema"] = schema
     return metadata
 
 
-# Redis에 저장된 기존 데이터와 비교 → 변경된 경우만 업데이트
-def update_metadata(table_name: str, schema: dict) -> bool:
-    new_metadata = generate_metadata(table_name, schema)
-    stored = redis_client.get(f"metadata:{table_name}")
-    stored_metadata = json.loads(stored) if stored else {}
+async def generate_metadata_async(table_name: str, schema: dict, schema_md: str = None, cache: bool = True) -> dict:
+    schema_md = schema_md or generate_table_markdown({table_name: schema})
+    result = await call_llm_async(prompt=prompt, parser=parser, variables={"schema": schema_md}, cache=cache)
+    metadata = result.model_dump()
+    metadata["schema"] = schema
+    return metadata
+
+
+def _markdown_unchanged(table_name: str, md_hash: str) -> bool:
+    return redis_bytes_client.hget(METADATA_HASH_KEY, table_name) == md_hash.encode() \
+        and bool(redis_bytes_client.exists(f"metadata:{table_name}"))
+
+
+def _store_metadata(table_name: str, new_metadata: dict, md_hash: str) -> bool:
+    stored = redis_bytes_client.get(f"metadata:{table_name}")
+    stored_metadata = codec.decode(stored) if stored else {}
+    redis_bytes_client.hset(METADATA_HASH_KEY, table_name, md_hash)
 
     if new_metadata["columns"] != stored_metadata.get("columns"):
-        redis_client.set(f"metadata:{table_name}", json.dumps(new_metadata, indent=2))
-        redis_client.sadd("metadata:table_names", table_name)
+        redis_bytes_client.set(f"metadata:{table_name}", codec.encode(new_metadata))
+        redis_bytes_client.sadd("metadata:table_names", table_name)
+        bump_metadata_version()
         print(f"Metadata updated for table: {table_name}")
         return True
 
     print(f"No metadata change for table: {table_name}")
-    return False
\ No newline at end of file
+    return False
+
+
+# Redis에 저장된 기존 데이터와 비교 → 변경된 경우만 업데이트
+# LLM 입력 markdown 의 hash 가 저장된 값과 같으면 LLM 호출 없이 건너뜀 (force=True 면 LLM 응답 캐시도 건너뛰고 재생성)
+def update_metadata(table_name: str, schema: dict, force: bool = False) -> bool:
+    schema_md = generate_table_markdown({table_name: schema})
+    md_hash = markdown_hash(schema_md)
+    if not force and _markdown_unchanged(table_name, md_hash):
+        print(f"Schema markdown unchanged for table: {table_name}, skipped")
+        return False
+
+    new_metadata = generate_metadata(table_name, schema, schema_md, cache=not force)
+    return _store_metadata(table_name, new_metadata, md_hash)
+
+
+# 여러 테이블 동시 생성: 동시성 제한 + rpm/tpm rate limit + 지수 backoff 재시도
+async def update_metadata_batch(schemas: Dict[str, dict], force: bool = False,
+                                concurrency: int = METADATA_CONCURRENCY, rpm: int = METADATA_RPM,
+                                tpm: int = METADATA_TPM, max_attempts: int = METADATA_MAX_ATTEMPTS) -> dict:
+    """
+    Async batch counterpart of `update_metadata` for {table_name: schema}.
+    Returns a report: {"updated": [...], "unchanged": [...], "skipped": [...], "failed": {table: error}}
+    — one table failing (after `max_attempts` tries) does not stop the others.
+    """
+    limiter = AsyncRateLimiter(rpm=rpm, tpm=tpm)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    report = {"updated": [], "unchanged": [], "skipped": [], "failed": {}}
+
+    async def generate(table_name, schema, schema_md):
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(max_attempts),
+            wait=wait_random_exponential(multiplier=1, max=60),
+            reraise=True,
+        ):
+            with attempt:
+                await limiter.acquire(estimate_tokens(schema_md) + METADATA_OUTPUT_TOKENS)
+                return await generate_metadata_async(table_name, schema, schema_md, cache=not force)
+
+    async def process(table_name, schema):
+        schema_md = generate_table_markdown({table_name: schema})
+        md_hash = markdown_hash(schema_md)
+        if not force and _markdown_unchanged(table_name, md_hash):
+            report["skipped"].append(table_name)
+            return
+        async with semaphore:
+            try:
+                new_metadata = await generate(table_name, schema, schema_md)
+            except Exception as e:
+                print(f"⚠️ Metadata generation failed for table: {table_name}: {e}")
+                report["failed"][table_name] = f"{type(e).__name__}: {e}"
+                return
+        changed = _store_metadata(table_name, new_metadata, md_hash)
+        report["updated" if changed else "unchanged"].append(table_name)
+
+    await asyncio.gather(*(process(table_name, schema) for table_name, schema in schemas.items()))
+    for key in ("updated", "unchanged", "skipped"):
+        report[key].sort()
+    print(f"Metadata batch: {len(report['updated'])} updated, {len(report['unchanged'])} unchanged, "
+          f"{len(report['skipped'])} skipped, {len(report['failed'])} failed")
+    return report
+
+
+# 데이터만 바뀐 테이블: LLM 호출 없이 저장된 메타데이터의 schema(통계)만 교체
+def refresh_metadata_stats(table_name: str, schema: dict) -> bool:
+    stored = redis_bytes_client.get(f"metadata:{table_name}")
+    if not stored:
+        return update_metadata(table_name, schema)
+
+    stored_metadata = codec.decode(stored)
+    stored_metadata["schema"] = schema
+    redis_bytes_client.set(f"metadata:{table_name}", codec.encode(stored_metadata))
+    bump_metadata_version()
+    print(f"Metadata stats refreshed for table: {table_name}")
+    return True
+
+
+# 삭제된 테이블의 메타데이터 정리
+def remove_metadata(table_names) -> None:
+    for table_name in table_names:
+        redis_bytes_client.delete(f"metadata:{table_name}")
+        redis_bytes_client.srem("metadata:table_names", table_name)
+        redis_bytes_client.hdel(METADATA_HASH_KEY, table_name)
+        print(f"Metadata removed for table: {table_name}")
+    # 삭제가 끝난 뒤에 version 을 올려야 다른 프로세스가 삭제 전 상태를 다시 캐시하지 않음
+    if table_names:
+        bump_metadata_version()
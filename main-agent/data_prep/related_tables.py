@@ -1,17 +1,45 @@
 
 from typing import Dict, List
-import psycopg2
-import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
-from config.db_settings import DB_CONFIG
-from config.redis import redis_client
+from utils import codec
+from utils.config import DB_CONFIG
+from utils.redis_client import redis_bytes_client
+from utils.database import Database, get_pool
+from utils.table_names import table_name, split_table_name
+from utils.query_cache import bump_schema_version
+from utils.metadata_registry import bump_metadata_version
+from .sample_estimators import estimate_distinct, scale_count, required_sample_percent
+
+database = Database()
 
 # 타입 분류
 NUMERIC_TYPES = ['integer', 'numeric', 'real', 'double precision', 'smallint', 'bigint']
 DATE_TYPES = ['date', 'timestamp', 'timestamp without time zone', 'timestamp with time zone']
 TEXT_TYPES = ['character varying', 'varchar', 'text']
 
+PROFILE_EXAMPLE_ROWS = 1000  # rows read from the head of a table to pick example values
+PROFILE_MAX_SELECT_ITEMS = 1000  # target lists are capped at 1664 entries; wider tables are profiled in batches
+PROFILE_MODES = ("exact", "catalog", "approx")
+# "catalog" = planner statistics (pg_stats / pg_class), "approx" = estimates from a block sample
+PROFILE_MODE = os.getenv("METADATA_PROFILE_MODE", "exact")
+# 표본 크기는 허용 오차로부터 계산: 값의 비율(top value 빈도, median 순위)이 ±APPROX_MAX_ERROR 이내 (95% 신뢰)
+APPROX_MAX_ERROR = float(os.getenv("METADATA_APPROX_MAX_ERROR", 0.01))
+APPROX_MIN_SAMPLE_ROWS = int(os.getenv("METADATA_APPROX_MIN_SAMPLE_ROWS", 10000))  # lower bound on sampled rows
+APPROX_SEED = 42  # REPEATABLE seed → every sample query of a table reads the same blocks
+EXTRACT_CONCURRENCY = int(os.getenv("METADATA_EXTRACT_CONCURRENCY", 4))  # tables profiled in parallel (capped at the pool size)
+# 추출 대상 schema (쉼표 구분); 비어 있으면 시스템 schema 를 제외한 전체. public 밖의 테이블은 "schema.table"
+EXTRACT_SCHEMAS = tuple(s.strip() for s in os.getenv("METADATA_SCHEMAS", "").split(",") if s.strip())
+
+# table_relations 는 테이블 단위 Redis hash 로 저장 (값은 utils.codec 인코딩)
+TABLE_RELATIONS_KEY = "table_relations:tables"  # hash: table → {"edges", "outbound", "inbound"}
+TABLE_SCHEMA_KEY = "table_relations:schema"  # hash: table → source schema (columns + stats) of that table
+LEGACY_TABLE_RELATIONS_KEY = "table_relations"  # former single JSON blob; read once for migration
+TABLE_RELATIONS_REFRESHED_AT_KEY = "table_relations:refreshed_at"  # epoch seconds of the last completed refresh
+
 # 컬럼 통계 수집 함수
 def get_column_stats(cursor, table: str, col: str, dtype: str) -> dict:
     stats = {}
@@ -104,92 +132,548 @@ def get_column_stats(cursor, table: str, col: str, dtype: str) -> dict:
 
     return stats
 
-# 전체 스키마 추출 함수
-def extract_schema() -> dict:
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+# ------------------------ 테이블 단위 프로파일링 ------------------------
+def _median_aggregate(col: str, dtype: str) -> str:
+    q = f'"{col}"'
+    if dtype in DATE_TYPES:
+        return f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM {q}))"
+    return f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY {q})"
 
-    cursor.execute("""
-        SELECT table_name FROM information_schema.tables
-        WHERE table_schema = 'public' AND table_type = 'BASE TABLE';
+
+def _column_aggregates(col: str, dtype: str, exact: bool = True) -> List[str]:
+    """`exact=False` leaves out COUNT(DISTINCT) and the median (NULL placeholders)."""
+    q = f'"{col}"'
+    items = [f"COUNT({q})", f"COUNT(DISTINCT {q})" if exact else "NULL"]
+    if dtype in NUMERIC_TYPES:
+        items += [f"MIN({q})", f"MAX({q})", f"AVG({q})", f"STDDEV_POP({q})",
+                  _median_aggregate(col, dtype) if exact else "NULL"]
+    elif dtype in DATE_TYPES:
+        items += [f"MIN({q})", f"MAX({q})", _median_aggregate(col, dtype) if exact else "NULL"]
+    elif dtype == 'boolean':
+        items += [f"MIN(CAST({q} AS INT))", f"MAX(CAST({q} AS INT))"]
+    return items
+
+
+def _median_value(median, dtype: str):
+    if dtype in DATE_TYPES:
+        return datetime.fromtimestamp(float(median), tz=timezone.utc).isoformat() if median else None
+    return median
+
+
+def _column_stats(total: int, values, dtype: str) -> dict:
+    non_null, distinct, *rest = values
+    stats = {"count": total, "nulls": total - non_null, "distinct": distinct}
+    if dtype in NUMERIC_TYPES:
+        min_, max_, avg, stddev, median = rest
+        stats.update({
+            "min": min_,
+            "max": max_,
+            "avg": round(avg, 3) if avg else None,
+            "stddev": round(stddev, 3) if stddev else None,
+            "median": median
+        })
+    elif dtype in DATE_TYPES:
+        min_, max_, median = rest
+        stats.update({
+            "min": min_,
+            "max": max_,
+            "median": _median_value(median, dtype)
+        })
+    elif dtype == 'boolean':
+        stats.update({"min": rest[0], "max": rest[1]})
+    return stats
+
+
+def _aggregate_pass(cursor, table: str, column_types: Dict[str, str], exact: bool = True) -> Dict[str, dict]:
+    """
+    count/nulls/distinct/min/max/avg/stddev/median of every column in one scan per batch.
+    `exact=False` leaves out the sort / hash heavy COUNT(DISTINCT) and median (both None).
+    """
+    batches, batch, size = [], [], 0
+    for col, dtype in column_types.items():
+        items = _column_aggregates(col, dtype, exact)
+        if batch and size + len(items) > PROFILE_MAX_SELECT_ITEMS:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append((col, dtype, items))
+        size += len(items)
+    if batch:
+        batches.append(batch)
+
+    stats = {}
+    for batch in batches:
+        select = ", ".join(["COUNT(*)"] + [item for _, _, items in batch for item in items])
+        cursor.execute(f"SELECT {select} FROM {table}")
+        row = cursor.fetchone()
+        pos = 1
+        for col, dtype, items in batch:
+            stats[col] = _column_stats(row[0], row[pos:pos + len(items)], dtype)
+            pos += len(items)
+    return stats
+
+
+def _top_values_pass(cursor, table: str, text_columns: List[str], stats: Dict[str, dict], k: int = 3):
+    """Top-k values of every text column in one GROUPING SETS scan."""
+    if not text_columns:
+        return
+    quoted = [f'"{col}"' for col in text_columns]
+    set_id = " ".join(f"WHEN GROUPING({q}) = 0 THEN {i}" for i, q in enumerate(quoted))
+    value = " ".join(f"WHEN GROUPING({q}) = 0 THEN {q}::text" for q in quoted)
+    sets = ", ".join(f"({q})" for q in quoted)
+    cursor.execute(f"""
+        SELECT set_id, value, freq FROM (
+            SELECT set_id, value, freq,
+                   ROW_NUMBER() OVER (PARTITION BY set_id ORDER BY freq DESC) AS rn
+            FROM (
+                SELECT CASE {set_id} END AS set_id, CASE {value} END AS value, COUNT(*) AS freq
+                FROM {table}
+                GROUP BY GROUPING SETS ({sets})
+            ) grouped
+        ) ranked
+        WHERE rn <= {k}
+        ORDER BY set_id, rn
     """)
-    tables = [row[0] for row in cursor.fetchall()]
-    schema_info = {}
+    for col in text_columns:
+        stats[col]["top_values"] = {}
+    for set_id, value, freq in cursor.fetchall():
+        stats[text_columns[set_id]]["top_values"][str(value)] = freq
 
-    for table in tables:
-        cursor.execute(f"""
-            SELECT column_name, data_type, is_nullable, column_default
-            FROM information_schema.columns
-            WHERE table_name = '{table}';
-        """)
-        columns_raw = cursor.fetchall()
-        columns = {}
-
-        for col, dtype, nullable, default in columns_raw:
-            col_info = {
-                "type": dtype,
-                "nullable": (nullable == 'YES'),
-                "default": default
-            }
-            col_info.update(get_column_stats(cursor, table, col, dtype))
-            columns[col] = col_info
-
-        # Primary key
-        cursor.execute(f"""
-            SELECT a.attname FROM pg_index i
-            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
-            WHERE i.indrelid = '{table}'::regclass AND i.indisprimary;
-        """)
-        pk = [r[0] for r in cursor.fetchall()]
-        for col in pk:
-            if col in columns:
-                columns[col]["pk"] = True
 
-        # Unique constraints
-        cursor.execute(f"""
-            SELECT a.attname FROM pg_constraint c
-            JOIN pg_class t ON c.conrelid = t.oid
-            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(c.conkey)
-            WHERE c.contype = 'u' AND t.relname = '{table}';
-        """)
-        uq = [r[0] for r in cursor.fetchall()]
-        for col in uq:
-            if col in columns:
-                columns[col]["unique"] = True
+def _examples_pass(cursor, table: str, columns: List[str], stats: Dict[str, dict], k: int = 3):
+    """
+    Up to k distinct non-null example values per column from a bounded read of the table head.
+    Sparse columns (all NULL in that head) take their examples from the top values when profiled,
+    otherwise they get fewer (or no) examples — no extra scan per column.
+    """
+    select = ", ".join(f'"{col}"' for col in columns)
+    cursor.execute(f"SELECT {select} FROM {table} LIMIT {PROFILE_EXAMPLE_ROWS}")
+    examples = {col: [] for col in columns}
+    for row in cursor.fetchall():
+        for col, value in zip(columns, row):
+            if value is not None and len(examples[col]) < k and str(value) not in examples[col]:
+                examples[col].append(str(value))
 
-        # Foreign keys
-        cursor.execute(f"""
-            SELECT kcu.column_name, ccu.table_name, ccu.column_name
-            FROM information_schema.table_constraints AS tc
-            JOIN information_schema.key_column_usage AS kcu ON tc.constraint_name = kcu.constraint_name
-            JOIN information_schema.constraint_column_usage AS ccu ON ccu.constraint_name = tc.constraint_name
-            WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_name = '{table}';
-        """)
-        fk_tuples = cursor.fetchall()
-        foreign_keys = []
-        for col, ref_table, ref_col in fk_tuples:
-            foreign_keys.append((col, ref_table, ref_col))
-            if col in columns:
+    for col in columns:
+        if not examples[col]:
+            # top_values 의 NULL 그룹은 "None" 으로 들어 있으므로 제외
+            examples[col] = [value for value in stats[col].get("top_values", {}) if value != "None"][:k]
+        stats[col]["examples"] = examples[col]
+
+
+def profile_table(cursor, table: str, column_types: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Column stats (same keys as `get_column_stats`) for all columns of `table`:
+    one aggregate scan, one GROUPING SETS scan for text top values and a bounded read for examples.
+    Falls back to per-column `get_column_stats` when the combined queries fail.
+    """
+    try:
+        stats = _aggregate_pass(cursor, table, column_types)
+        _top_values_pass(cursor, table, [col for col, dtype in column_types.items() if dtype in TEXT_TYPES], stats)
+        _examples_pass(cursor, table, list(column_types), stats)
+        return stats
+    except Exception as e:
+        cursor.connection.rollback()
+        print(f"⚠️ Single-pass profiling failed for {table}, profiling column by column: {e}")
+
+    stats = {}
+    for col, dtype in column_types.items():
+        stats[col] = get_column_stats(cursor, table, col, dtype)
+        if "stats_error" in stats[col]:
+            cursor.connection.rollback()
+    return stats
+
+# ------------------------ 표본 기반 근사 프로파일링 ------------------------
+def _sample_clause(sample_percent: float) -> str:
+    if sample_percent >= 100:
+        return ""
+    return f" TABLESAMPLE SYSTEM ({sample_percent}) REPEATABLE ({APPROX_SEED})"
+
+
+def _sample_frequency_pass(cursor, table: str, column_types: Dict[str, str], stats: Dict[str, dict],
+                           sample_percent: float, k: int = 3):
+    """
+    Per column value frequencies of the sample, reduced on the server to distinct count (d),
+    singletons (f1), sampled values (n) and the top-k: one GROUPING SETS query over the sample.
+    """
+    columns = list(column_types)
+    quoted = [f'"{col}"' for col in columns]
+    set_id = " ".join(f"WHEN GROUPING({q}) = 0 THEN {i}" for i, q in enumerate(quoted))
+    value = " ".join(f"WHEN GROUPING({q}) = 0 THEN {q}" for q in quoted)
+    sets = ", ".join(f"({q})" for q in quoted)
+    # 표본은 text 로 변환해 두어 json 등 비교 연산자가 없는 타입도 그룹핑 가능
+    cursor.execute(f"""
+        WITH sample AS MATERIALIZED (
+            SELECT {", ".join(f"{q}::text AS {q}" for q in quoted)} FROM {table}{_sample_clause(sample_percent)}
+        ), grouped AS (
+            SELECT CASE {set_id} END AS set_id, CASE {value} END AS value, COUNT(*) AS freq
+            FROM sample
+            GROUP BY GROUPING SETS ({sets})
+        ), counted AS (
+            SELECT set_id, value, freq,
+                   ROW_NUMBER() OVER (PARTITION BY set_id ORDER BY freq DESC, value) AS rn,
+                   COUNT(*) OVER (PARTITION BY set_id) AS d,
+                   SUM(freq) OVER (PARTITION BY set_id) AS n,
+                   COUNT(*) FILTER (WHERE freq = 1) OVER (PARTITION BY set_id) AS f1
+            FROM grouped
+            WHERE value IS NOT NULL
+        )
+        SELECT set_id, value, freq, d, n, f1 FROM counted
+        WHERE rn <= {k}
+        ORDER BY set_id, rn
+    """)
+    rows = cursor.fetchall()
+
+    for col, dtype in column_types.items():
+        # 표본에 non-null 값이 없으면 추정 불가 → 전부 NULL 인 컬럼만 0, 나머지는 키를 생략
+        if stats[col]["count"] == stats[col]["nulls"]:
+            stats[col]["distinct"] = 0
+        else:
+            stats[col].pop("distinct", None)
+        stats[col]["approximate"] = []
+        if dtype in TEXT_TYPES:
+            stats[col]["top_values"] = {}
+            stats[col]["approximate"].append("top_values")
+    for set_id, value, freq, d, n, f1 in rows:
+        col = columns[set_id]
+        population = stats[col]["count"] - stats[col]["nulls"]
+        if "distinct" not in stats[col]:
+            stats[col]["distinct"] = estimate_distinct(int(n), int(d), int(f1), population)
+            stats[col]["approximate"].append("distinct")
+        if "top_values" in stats[col]:
+            stats[col]["top_values"][value] = scale_count(int(freq), int(n), population)
+
+
+def _sample_median_pass(cursor, table: str, column_types: Dict[str, str], stats: Dict[str, dict],
+                        sample_percent: float):
+    """Medians of numeric / date columns over the same (REPEATABLE) sample."""
+    columns = [(col, dtype) for col, dtype in column_types.items() if dtype in NUMERIC_TYPES or dtype in DATE_TYPES]
+    if not columns:
+        return
+    select = ", ".join(_median_aggregate(col, dtype) for col, dtype in columns)
+    cursor.execute(f"SELECT {select} FROM {table}{_sample_clause(sample_percent)}")
+    row = cursor.fetchone()
+    for (col, dtype), median in zip(columns, row):
+        if median is None and stats[col]["count"] > stats[col]["nulls"]:
+            stats[col].pop("median", None)  # 표본에 non-null 값이 없음
+            continue
+        stats[col]["median"] = _median_value(median, dtype)
+        if median is not None:
+            stats[col]["approximate"].append("median")
+
+
+def approx_profile_table(cursor, table: str, column_types: Dict[str, str], max_error: float = APPROX_MAX_ERROR,
+                         min_sample_rows: int = APPROX_MIN_SAMPLE_ROWS) -> Dict[str, dict]:
+    """
+    Like `profile_table`, but without the sort / hash heavy parts over the whole table:
+    one aggregate scan for count/nulls/min/max/avg/stddev (no COUNT(DISTINCT), no median), then a
+    TABLESAMPLE SYSTEM block sample for distinct (Duj1 estimate), top values (scaled frequencies)
+    and medians, and a bounded read for examples.
+    The sample fraction is derived from `max_error` (bound on a value's share of the table, see
+    `sample_rows_for_error`) and `min_sample_rows`; tables smaller than that are read whole.
+    Block sampling assumes values are not clustered by physical order; distinct has no such bound.
+    Estimated keys are listed in each column's "approximate".
+    """
+    try:
+        stats = _aggregate_pass(cursor, table, column_types, exact=False)
+        total = next(iter(stats.values()))["count"] if stats else 0
+        percent = required_sample_percent(total, max_error, min_sample_rows)
+        _sample_frequency_pass(cursor, table, column_types, stats, percent)
+        _sample_median_pass(cursor, table, column_types, stats, percent)
+        _examples_pass(cursor, table, list(column_types), stats)
+    except Exception as e:
+        cursor.connection.rollback()
+        print(f"⚠️ Approximate profiling failed for {table}, profiling exactly: {e}")
+        return profile_table(cursor, table, column_types)
+    for col_stats in stats.values():
+        col_stats["stats_source"] = "approx"
+    return stats
+
+# ------------------------ 카탈로그(planner 통계) 기반 프로파일링 ------------------------
+def _stat_value(value: str, dtype: str):
+    """pg_stats array element (text) → Python value comparable within its column."""
+    if dtype in NUMERIC_TYPES:
+        number = float(value)
+        return int(number) if dtype in ('integer', 'smallint', 'bigint') else number
+    if dtype == 'boolean':
+        return 1 if value == 't' else 0
+    return value  # date / timestamp 은 ISO 형식 문자열이므로 문자열 비교로 순서가 유지됨
+
+
+def _catalog_median(mcv, mcv_freqs, histogram, null_frac: float):
+    # MCV 와 histogram 을 합친 누적 분포에서 0.5 지점
+    if not mcv and not histogram:
+        return None
+    points = list(zip(mcv, mcv_freqs))
+    if histogram and len(histogram) > 1:
+        rest = max(0.0, 1.0 - null_frac - sum(mcv_freqs))
+        share = rest / (len(histogram) - 1)
+        points += [(value, share) for value in histogram[1:]]
+    points.sort(key=lambda p: p[0])
+    half, cumulative = sum(freq for _, freq in points) / 2, 0.0
+    for value, freq in points:
+        cumulative += freq
+        if cumulative >= half:
+            return value
+    return points[-1][0]
+
+
+CATALOG_ESTIMATES = ("count", "nulls", "distinct", "min", "max", "median", "top_values")
+
+
+def _catalog_column_stats(reltuples: float, dtype: str, null_frac, n_distinct, mcv, mcv_freqs, histogram) -> dict:
+    count = int(reltuples)
+    mcv = [_stat_value(v, dtype) for v in (mcv or [])]
+    mcv_freqs = list(mcv_freqs or [])
+    histogram = [_stat_value(v, dtype) for v in (histogram or [])]
+    stats = {
+        "count": count,
+        "nulls": round(null_frac * count),
+        # 음수 n_distinct = -(distinct / 행 수)
+        "distinct": round(n_distinct if n_distinct >= 0 else -n_distinct * count),
+    }
+    if dtype in NUMERIC_TYPES or dtype in DATE_TYPES or dtype == 'boolean':
+        values = mcv + histogram
+        stats["min"] = min(values) if values else None
+        stats["max"] = max(values) if values else None
+    if dtype in NUMERIC_TYPES or dtype in DATE_TYPES:
+        stats["median"] = _catalog_median(mcv, mcv_freqs, histogram, null_frac)
+    if dtype in TEXT_TYPES:
+        stats["top_values"] = {str(v): round(f * count) for v, f in list(zip(mcv, mcv_freqs))[:3]}
+    examples = (mcv or histogram)[:3]
+    if dtype == 'boolean':
+        # min/max 비교용 1/0 → exact 모드 예시와 같은 표기 (str(True) / str(False))
+        examples = [bool(v) for v in examples]
+    stats["examples"] = [str(v) for v in examples]
+    stats["stats_source"] = "catalog"
+    stats["approximate"] = [key for key in CATALOG_ESTIMATES if key in stats]
+    return stats
+
+
+def _exact_moments(cursor, table: str, numeric_columns: List[str]) -> Dict[str, tuple]:
+    """avg/stddev are not in the catalog: one scan for all numeric columns."""
+    if not numeric_columns:
+        return {}
+    select = ", ".join(f'AVG("{col}"), STDDEV_POP("{col}")' for col in numeric_columns)
+    cursor.execute(f"SELECT {select} FROM {table}")
+    row = cursor.fetchone()
+    return {col: (row[2 * i], row[2 * i + 1]) for i, col in enumerate(numeric_columns)}
+
+
+def catalog_profile_table(cursor, table: str, column_types: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Column stats from planner statistics (pg_class.reltuples, pg_stats). count/nulls/distinct/min/max/median,
+    top values and examples are estimates from the last ANALYZE; avg/stddev come from one exact scan.
+    Tables that were never analyzed, and columns without pg_stats rows, are profiled exactly.
+    """
+    cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", (table,))
+    reltuples = cursor.fetchone()[0]
+    if reltuples is None or reltuples < 0:  # ANALYZE 된 적 없음
+        return profile_table(cursor, table, column_types)
+
+    cursor.execute("""
+        SELECT attname, null_frac, n_distinct,
+               most_common_vals::text::text[], most_common_freqs, histogram_bounds::text::text[]
+        FROM pg_stats
+        WHERE schemaname = %s AND tablename = %s
+          -- 상속/파티션 부모는 컬럼마다 두 행: 파티션 테이블은 inherited 행만 있으므로 그것을, 나머지는 자기 행만
+          AND inherited = (SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass)
+    """, (*split_table_name(table), table))
+    catalog = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    stats = {}
+    for col, dtype in column_types.items():
+        if col in catalog:
+            stats[col] = _catalog_column_stats(reltuples, dtype, *catalog[col])
+
+    numeric = [col for col, dtype in column_types.items() if col in stats and dtype in NUMERIC_TYPES]
+    for col, (avg, stddev) in _exact_moments(cursor, table, numeric).items():
+        stats[col]["avg"] = round(avg, 3) if avg else None
+        stats[col]["stddev"] = round(stddev, 3) if stddev else None
+
+    missing = {col: dtype for col, dtype in column_types.items() if col not in stats}
+    if missing:
+        stats.update(profile_table(cursor, table, missing))
+    # 컬럼 순서를 information_schema 순서로 유지
+    return {col: stats[col] for col in column_types}
+
+
+def analyze_tables(tables: List[str]):
+    """Refreshes planner statistics. Runs on the primary (ANALYZE is not allowed on replicas)."""
+    with database.connection() as conn:
+        with conn.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f"ANALYZE {table}")
+        conn.commit()
+# ------------------------ 카탈로그 일괄 조회 (구조) ------------------------
+def schema_filter(column: str) -> tuple:
+    """SQL condition (and its params) restricting a schema-name `column` to the extracted schemas."""
+    if EXTRACT_SCHEMAS:
+        return f"{column} = ANY(%s)", (list(EXTRACT_SCHEMAS),)
+    return f"{column} <> 'information_schema' AND {column} !~ '^pg_'", ()
+
+
+def introspect_tables(tables: List[str] = None) -> Dict[str, dict]:
+    """
+    Structure (columns, keys and constraints, no stats) of every base table in two pg_catalog queries,
+    assembled in Python — catalog time does not grow with one round trip per table.
+    `tables` limits the result to the given tables (default: every table in the extracted schemas).
+    """
+    condition, params = schema_filter("n.nspname")
+    with database.connection(readonly=True) as conn:
+        with conn.cursor() as cursor:
+            # 테이블 + 컬럼 (컬럼 없는 테이블도 포함)
+            # 타입 문자열은 information_schema.columns.data_type 과 같은 규칙 (ARRAY / USER-DEFINED 포함)
+            # → 저장된 structure_hash, 프로파일링 타입 분류가 그대로 유지됨
+            cursor.execute(f"""
+                SELECT n.nspname, c.relname, a.attname,
+                       CASE WHEN t.typtype = 'd' THEN
+                                CASE WHEN bt.typelem <> 0 AND bt.typlen = -1 THEN 'ARRAY'
+                                     WHEN nbt.nspname = 'pg_catalog' THEN format_type(t.typbasetype, NULL)
+                                     ELSE 'USER-DEFINED' END
+                            ELSE
+                                CASE WHEN t.typelem <> 0 AND t.typlen = -1 THEN 'ARRAY'
+                                     WHEN nt.nspname = 'pg_catalog' THEN format_type(a.atttypid, NULL)
+                                     ELSE 'USER-DEFINED' END
+                       END,
+                       NOT a.attnotnull, pg_get_expr(d.adbin, d.adrelid)
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                LEFT JOIN pg_type t ON t.oid = a.atttypid
+                LEFT JOIN pg_namespace nt ON nt.oid = t.typnamespace
+                LEFT JOIN pg_type bt ON t.typtype = 'd' AND bt.oid = t.typbasetype
+                LEFT JOIN pg_namespace nbt ON nbt.oid = bt.typnamespace
+                LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+                WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition AND {condition}
+                ORDER BY n.nspname, c.relname, a.attnum;
+            """, params)
+            column_rows = cursor.fetchall()
+
+            # PK / UNIQUE / FK / CHECK 를 한 번에 (키 컬럼은 제약조건 정의 순서대로)
+            cursor.execute(f"""
+                SELECT n.nspname, c.relname, con.contype,
+                       ARRAY(SELECT a.attname::text FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+                             JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                             ORDER BY k.ord),
+                       rn.nspname, rc.relname,
+                       ARRAY(SELECT a.attname::text FROM unnest(con.confkey) WITH ORDINALITY k(attnum, ord)
+                             JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                             ORDER BY k.ord),
+                       CASE WHEN con.contype = 'c' THEN pg_get_expr(con.conbin, con.conrelid) END
+                FROM pg_constraint con
+                JOIN pg_class c ON c.oid = con.conrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                LEFT JOIN pg_class rc ON rc.oid = con.confrelid
+                LEFT JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+                WHERE con.contype IN ('p', 'u', 'f', 'c') AND {condition}
+                ORDER BY n.nspname, c.relname, con.conname;
+            """, params)
+            constraint_rows = cursor.fetchall()
+
+    wanted = None if tables is None else set(tables)
+    structures = {}
+    for schema, relname, col, dtype, nullable, default in column_rows:
+        table = table_name(schema, relname)
+        if wanted is not None and table not in wanted:
+            continue
+        info = structures.setdefault(table, {
+            "columns": {}, "primary_key": [], "foreign_keys": [], "check_constraints": []
+        })
+        if col is not None:
+            info["columns"][col] = {"type": dtype, "nullable": nullable, "default": default}
+
+    for schema, relname, contype, cols, ref_schema, ref_relname, ref_cols, check in constraint_rows:
+        info = structures.get(table_name(schema, relname))
+        if info is None:
+            continue
+        columns = info["columns"]
+        if contype == 'p':
+            info["primary_key"] = cols
+            for col in cols:
+                columns[col]["pk"] = True
+        elif contype == 'u':
+            for col in cols:
+                columns[col]["unique"] = True
+        elif contype == 'f':
+            ref_table = table_name(ref_schema, ref_relname)
+            for col, ref_col in zip(cols, ref_cols):
+                info["foreign_keys"].append((col, ref_table, ref_col))
                 columns[col]["fk"] = f"{ref_table}.{ref_col}"
+        else:
+            info["check_constraints"].append(check)
 
-        # Check constraints
-        cursor.execute(f"""
-            SELECT conname, pg_get_expr(conbin, conrelid)
-            FROM pg_constraint
-            WHERE contype = 'c' AND conrelid = '{table}'::regclass;
-        """)
-        checks = cursor.fetchall()
-        check_constraints = [expr for _, expr in checks]
+    # 테이블 이름 순서 (schema 순서가 아닌 key 순서)
+    return dict(sorted(structures.items()))
+
+
+# 테이블 단위 스키마 추출 함수
+def extract_table(table: str, profile=profile_table, structure: dict = None) -> dict:
+    """
+    Columns (with stats), keys and constraints of one table; stats are profiled on its own pooled connection.
+    `structure` is the table's entry from `introspect_tables` (looked up when not given);
+    `profile=None` skips column stats (structure only).
+    """
+    if structure is None:
+        structure = introspect_tables([table]).get(table)
+        if structure is None:
+            raise ValueError(f"Table not found: {table}")
+    schema = {**structure, "columns": {col: dict(meta) for col, meta in structure["columns"].items()}}
+    if profile is None:
+        return schema
 
-        schema_info[table] = {
-            "columns": columns,
-            "primary_key": pk,
-            "foreign_keys": foreign_keys,
-            "check_constraints": check_constraints
-        }
-    cursor.close()
-    conn.close()
-    return schema_info
+    columns = schema["columns"]
+    with database.connection(readonly=True) as conn:  # 프로파일링 스캔은 replica 로
+        with conn.cursor() as cursor:
+            column_stats = profile(cursor, table, {col: info["type"] for col, info in columns.items()})
+    for col, stats in column_stats.items():
+        columns[col].update(stats)
+    return schema
+
+
+def list_tables() -> List[str]:
+    """Base tables of the extracted schemas (`METADATA_SCHEMAS`, default: every non-system schema)."""
+    condition, params = schema_filter("n.nspname")
+    with database.connection(readonly=True) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT n.nspname, c.relname FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition AND {condition};
+            """, params)
+            return sorted(table_name(schema, relname) for schema, relname in cursor.fetchall())
+
+
+# 전체 스키마 추출 함수
+def extract_schema(profile_mode: str = PROFILE_MODE, analyze: bool = False,
+                   concurrency: int = EXTRACT_CONCURRENCY, tables: List[str] = None) -> dict:
+    """
+    profile_mode:
+    - "exact": column stats from full scans of every table (`profile_table`)
+    - "catalog": column stats from pg_stats / pg_class (`catalog_profile_table`); `analyze=True` runs ANALYZE first
+    - "approx": exact cheap aggregates, distinct / top values / median from a block sample (`approx_profile_table`)
+
+    Structure comes from one batched catalog read (`introspect_tables`); column stats are profiled by up to
+    `concurrency` worker threads (at most the pool size), each on its own pooled connection.
+    The result is keyed in table-name order, identical to a serial run (`concurrency=1`).
+    `tables` limits extraction to the given tables (default: every base table of the extracted schemas).
+    """
+    if profile_mode not in PROFILE_MODES:
+        raise ValueError(f"Unsupported profile_mode: {profile_mode}. Use one of {PROFILE_MODES}.")
+
+    structures = introspect_tables(tables)
+    tables = list(structures)
+    if profile_mode == "catalog" and analyze:
+        analyze_tables(tables)
+    profile = {"catalog": catalog_profile_table, "approx": approx_profile_table}.get(profile_mode, profile_table)
+
+    # worker 마다 풀 연결 하나를 오래 잡으므로 풀 크기를 넘으면 checkout 대기 → PoolTimeoutError
+    workers = max(1, min(concurrency, len(tables), get_pool().max_size))
+    if workers == 1:
+        return {table: extract_table(table, profile, structures[table]) for table in tables}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract_schema") as executor:
+        # map 은 입력 순서대로 결과를 돌려주므로 완료 순서와 무관하게 결과가 결정적
+        results = executor.map(lambda table: extract_table(table, profile, structures[table]), tables)
+        return dict(zip(tables, results))
 
 
 def generate_edges(schema_info: dict) -> Dict[str, List[str]]:
@@ -227,22 +711,77 @@ def generate_edge_reason(edges: Dict[str, List[str]], schema_info: dict) -> Dict
                 })
     return metadata
 
-def update_table_relations() -> bool:
-    new_schema = extract_schema()
-    stored = redis_client.get("table_relations")
-    stored_schema = json.loads(stored)["source_schema"] if stored else {}
+def build_table_relations(schema_info: dict) -> Dict[str, dict]:
+    """Per-table view of the relation graph: outbound FK edges and inbound references with their reasons."""
+    edges = generate_edges(schema_info)
+    edge_reasons = generate_edge_reason(edges, schema_info)
+    relations = {table: {"edges": edges.get(table, []), "outbound": {}, "inbound": {}} for table in schema_info}
+    for key, reasons in edge_reasons.items():
+        from_table, to_table = key.split("→")
+        relations[from_table]["outbound"][to_table] = reasons
+        relations.setdefault(to_table, {"edges": [], "outbound": {}, "inbound": {}})["inbound"][from_table] = reasons
+    return relations
+
+
+def _decode_hash(raw: dict) -> dict:
+    return {(k.decode() if isinstance(k, bytes) else k): codec.decode(v) for k, v in raw.items()}
+
+
+def load_source_schema() -> dict:
+    """Schema the stored table_relations were generated from ({} if none)."""
+    stored = _decode_hash(redis_bytes_client.hgetall(TABLE_SCHEMA_KEY))
+    if not stored:
+        legacy = redis_bytes_client.get(LEGACY_TABLE_RELATIONS_KEY)
+        return codec.decode(legacy)["source_schema"] if legacy else {}
+    return dict(sorted(stored.items()))
+
+
+def get_table_relations(table_names: List[str]) -> Dict[str, dict]:
+    """Relations of only the requested tables (one HMGET); unknown tables are left out."""
+    if not table_names:
+        return {}
+    values = redis_bytes_client.hmget(TABLE_RELATIONS_KEY, table_names)
+    return {table: codec.decode(value) for table, value in zip(table_names, values) if value is not None}
+
+
+def update_table_relations(profile_mode: str = PROFILE_MODE, analyze: bool = False, schema: dict = None) -> bool:
+    """
+    `schema`: an already extracted schema (skips re-extraction).
+    Only the hash fields of tables whose schema or relations changed are rewritten.
+    """
+    new_schema = extract_schema(profile_mode, analyze) if schema is None else schema
+    # 저장본과 같은 형태(tuple → list, date → str)로 맞춰서 비교
+    new_schema = codec.normalize(new_schema)
+    stored_schema = load_source_schema()
+
+    changed = [table for table in new_schema if new_schema[table] != stored_schema.get(table)]
+    removed = [table for table in stored_schema if table not in new_schema]
+    legacy = redis_bytes_client.exists(LEGACY_TABLE_RELATIONS_KEY)
 
-    if new_schema != stored_schema:
-        edges = generate_edges(new_schema)
-        edge_reasons = generate_edge_reason(edges, new_schema)
+    if changed or removed or legacy:
+        relations = codec.normalize(build_table_relations(new_schema))
+        stored_relations = _decode_hash(redis_bytes_client.hgetall(TABLE_RELATIONS_KEY))
+        changed_relations = {t: rel for t, rel in relations.items() if stored_relations.get(t) != rel}
+        removed_relations = [t for t in stored_relations if t not in relations]
 
-        redis_client.set("table_relations", json.dumps({
-            "edges": edges,
-            "edge_reasons": edge_reasons,
-            "source_schema": new_schema
-        }, indent=2, default=str))
-        print("Schema updated in Redis.")
-        # return True
+        pipe = redis_bytes_client.pipeline()
+        if changed:
+            pipe.hset(TABLE_SCHEMA_KEY, mapping={t: codec.encode(new_schema[t]) for t in changed})
+        if removed:
+            pipe.hdel(TABLE_SCHEMA_KEY, *removed)
+        if changed_relations:
+            pipe.hset(TABLE_RELATIONS_KEY, mapping={t: codec.encode(rel) for t, rel in changed_relations.items()})
+        if removed_relations:
+            pipe.hdel(TABLE_RELATIONS_KEY, *removed_relations)
+        pipe.delete(LEGACY_TABLE_RELATIONS_KEY)
+        pipe.execute()
+        # 스키마가 바뀌었으므로 캐시된 쿼리 결과 무효화 (스키마는 기본 DB 에서 추출)
+        bump_schema_version(DB_CONFIG["dbname"])
+        bump_metadata_version()
+        redis_bytes_client.set(TABLE_RELATIONS_REFRESHED_AT_KEY, time.time())
+        print(f"Schema updated in Redis ({len(changed)} changed, {len(removed)} removed tables).")
+        return True
 
+    redis_bytes_client.set(TABLE_RELATIONS_REFRESHED_AT_KEY, time.time())
     print("No schema change detected. Did not update")
-    # return False
\ No newline at end of file
+    return False
@@ -1,23 +1,69 @@
-from .related_tables import extract_schema, update_table_relations
-from .metadata import update_metadata
+import asyncio
 
-def run():
+from .related_tables import (
+    extract_schema, introspect_tables, list_tables, load_source_schema, update_table_relations, PROFILE_MODE
+)
+from .metadata import update_metadata_batch, refresh_metadata_stats, remove_metadata
+from .change_tracking import (
+    get_table_activity, detect_changes, load_table_states, record_table_states, forget_tables, CHANGE_THRESHOLD
+)
+from utils.metadata_registry import list_tables as list_metadata_tables
+
+def run(profile_mode: str = PROFILE_MODE, analyze: bool = False, incremental: bool = True,
+        threshold: float = CHANGE_THRESHOLD, force: bool = False):
+    """
+    incremental=True: only tables whose structure changed, or whose data changed past `threshold`
+    (modified rows / live rows), are re-profiled; only structure changes are sent to the LLM.
+    force=True: regenerate LLM metadata even when the table markdown is unchanged.
+    """
     print("Starting data prep pipeline...")
 
-    # PostgreSQL에서 스키마 추출
-    schema = extract_schema()
+    tables = list_tables()
+    activity = get_table_activity()
+    if incremental:
+        structures = introspect_tables(tables)
+        changes = detect_changes(structures, activity, threshold, track_analyze=profile_mode == "catalog")
+    else:
+        removed = sorted(set(load_table_states()) - set(tables))
+        changes = {"structure": tables, "data": [], "unchanged": [], "removed": removed}
+    # 두 모드 모두: 메타데이터만 남은 삭제된 테이블도 정리 대상
+    changes["removed"] = sorted(set(changes["removed"]) | (set(list_metadata_tables()) - set(tables)))
+    print(f"- changes: {len(changes['structure'])} structure, {len(changes['data'])} data, "
+          f"{len(changes['unchanged'])} unchanged, {len(changes['removed'])} removed")
+
+    # PostgreSQL에서 변경된 테이블만 스키마 추출 (나머지는 저장된 스키마 재사용)
+    refreshed = extract_schema(profile_mode, analyze, tables=changes["structure"] + changes["data"])
+    stored = load_source_schema()
+    schema = {table: refreshed[table] if table in refreshed else stored.get(table) for table in tables}
+    missing = [table for table, table_schema in schema.items() if table_schema is None]
+    if missing:  # 상태는 있지만 저장된 스키마가 없는 경우
+        refreshed.update(extract_schema(profile_mode, analyze, tables=missing))
+        schema.update({table: refreshed[table] for table in missing})
     print("- schema extracted...")
 
     print("--- generating(updating) table relations...")
     # 테이블 관계 자료형 생성 및 업데이트
-    schema_changed = update_table_relations()
+    schema_changed = update_table_relations(schema=schema)
 
     # 테이블별 메타데이터 생성 및 업데이트
     print(f"----- generating(updating) metadata..")
-    for table_name, table_schema in schema.items():
-        update_metadata(table_name, table_schema)
+    report = asyncio.run(update_metadata_batch(
+        {table_name: schema[table_name] for table_name in changes["structure"] + missing}, force=force
+    ))
+    for table_name in changes["data"]:
+        refresh_metadata_stats(table_name, schema[table_name])
+    remove_metadata(changes["removed"])
+    if report["failed"]:
+        print(f"⚠️ Metadata generation failed for {len(report['failed'])} tables (retried on the next run):")
+        for table_name, error in report["failed"].items():
+            print(f"  - {table_name}: {error}")
+
+    # 실패한 테이블은 상태를 기록하지 않아 다음 실행에서 다시 처리됨
+    record_table_states({t: s for t, s in refreshed.items() if t not in report["failed"]}, activity)
+    forget_tables(changes["removed"])
 
     print("------- Data prep pipeline complete!")
+    return report
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
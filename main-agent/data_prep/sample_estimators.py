@@ -0,0 +1,42 @@
+# data_prep/sample_estimators.py
+# Population estimates from a row sample (approximate profiling mode).
+import math
+
+
+def estimate_distinct(sample_rows: int, sample_distinct: int, singletons: int, population: int) -> int:
+    """
+    Haas–Stokes "Duj1" estimator (the one PostgreSQL ANALYZE uses for n_distinct):
+        D = n·d / (n − f1 + f1·n / N)
+    n = non-null sampled values, d = distinct among them, f1 = values seen exactly once,
+    N = non-null values in the table. Clamped to [d, N]; a full sample (n ≥ N) returns d.
+    """
+    if sample_rows <= 0 or population <= 0:
+        return 0
+    if sample_rows >= population or singletons == 0:
+        return min(sample_distinct, population)
+    denominator = sample_rows - singletons + singletons * sample_rows / population
+    estimate = sample_rows * sample_distinct / denominator
+    return int(round(min(max(estimate, sample_distinct), population)))
+
+
+def scale_count(sample_count: int, sample_rows: int, population: int) -> int:
+    """Frequency in the sample → estimated frequency in the table."""
+    if sample_rows <= 0:
+        return 0
+    return int(round(sample_count * population / sample_rows))
+
+
+def sample_rows_for_error(max_error: float, z: float = 1.96) -> int:
+    """
+    Rows needed so that a value's share of the table (top-value frequency, median rank) is within
+    ±`max_error` at the confidence of `z` (1.96 ≈ 95%): worst case p = 0.5 → n = (z / 2ε)².
+    """
+    return math.ceil((z / (2 * max_error)) ** 2)
+
+
+def required_sample_percent(total_rows: int, max_error: float, min_sample_rows: int = 0) -> float:
+    """TABLESAMPLE percentage reaching the rows required by `max_error` (and at least `min_sample_rows`); 100 = read all."""
+    if total_rows <= 0:
+        return 100.0
+    required = max(sample_rows_for_error(max_error), min_sample_rows)
+    return min(100.0, 100.0 * required / total_rows)
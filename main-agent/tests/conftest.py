@@ -0,0 +1,5 @@
+import os
+import sys
+
+# main-agent 모듈(utils, data_prep, agents ...)을 최상위 패키지로 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
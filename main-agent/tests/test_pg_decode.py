@@ -0,0 +1,40 @@
+import io
+import math
+
+import pandas as pd
+
+from utils.pg_decode import COPY_NULL, csv_to_dataframe
+
+
+def test_copy_csv_special_float_values():
+    buf = io.StringIO(f"NaN,1,a\nInfinity,2,NaN\n-Infinity,3,b\n{COPY_NULL},{COPY_NULL},{COPY_NULL}\n1.5,4,c\n")
+    df = csv_to_dataframe(buf, ["x", "n", "s"], [701, 23, 25])  # float8, int4, text
+
+    assert str(df["x"].dtype) == "float64"
+    assert math.isnan(df["x"][0]) and math.isnan(df["x"][3])
+    assert df["x"][1] == math.inf and df["x"][2] == -math.inf and df["x"][4] == 1.5
+    assert str(df["n"].dtype) == "Int64" and df["n"].isna().tolist() == [False, False, False, True, False]
+    # text 컬럼의 "NaN" 은 값 그대로
+    assert df["s"][1] == "NaN"
+
+
+def test_copy_csv_numeric_nan():
+    df = csv_to_dataframe(io.StringIO("NaN\n2.25\n"), ["amount"], [1700])  # numeric
+    assert math.isnan(df["amount"][0]) and df["amount"][1] == 2.25
+
+
+def test_copy_csv_timestamps_with_trimmed_fractions():
+    buf = io.StringIO(
+        "2024-01-02 03:04:05,2024-01-02 03:04:05+05:30,2024-01-02\n"
+        "2024-01-02 03:04:05.25,2024-01-02 03:04:05.125+00,infinity\n"
+        f"infinity,-infinity,{COPY_NULL}\n"
+    )
+    df = csv_to_dataframe(buf, ["ts", "tstz", "d"], [1114, 1184, 1082])  # timestamp, timestamptz, date
+
+    assert df["ts"][0] == pd.Timestamp("2024-01-02 03:04:05")
+    assert df["ts"][1] == pd.Timestamp("2024-01-02 03:04:05.25")
+    assert df["tstz"][0] == pd.Timestamp("2024-01-01 21:34:05", tz="UTC")
+    assert df["tstz"][1] == pd.Timestamp("2024-01-02 03:04:05.125", tz="UTC")
+    assert df["d"][0] == pd.Timestamp("2024-01-02")
+    # infinity / -infinity / NULL → NaT
+    assert pd.isna(df["ts"][2]) and pd.isna(df["tstz"][2]) and pd.isna(df["d"][1]) and pd.isna(df["d"][2])
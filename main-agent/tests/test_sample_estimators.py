@@ -0,0 +1,46 @@
+import pytest
+
+from data_prep.sample_estimators import estimate_distinct, scale_count, sample_rows_for_error, required_sample_percent
+
+
+def test_full_sample_returns_sample_distinct():
+    assert estimate_distinct(1000, 250, 40, 1000) == 250
+
+
+def test_all_unique_sample_extrapolates_to_population():
+    # 표본의 모든 값이 한 번씩 → 유일값 컬럼으로 추정
+    assert estimate_distinct(5000, 5000, 5000, 100000) == 100000
+
+
+def test_no_singletons_keeps_sample_distinct():
+    # 모든 값이 여러 번 등장 → 값 종류가 표본에 다 나타났다고 봄
+    assert estimate_distinct(5000, 12, 0, 100000) == 12
+
+
+def test_estimate_is_between_sample_distinct_and_population():
+    estimate = estimate_distinct(5000, 3000, 2000, 100000)
+    assert 3000 <= estimate <= 100000
+
+
+def test_empty_inputs():
+    assert estimate_distinct(0, 0, 0, 100) == 0
+    assert scale_count(10, 0, 100) == 0
+
+
+def test_scale_count():
+    assert scale_count(50, 5000, 100000) == 1000
+
+
+def test_sample_rows_for_error():
+    # ±1% (95%) → (1.96 / 0.02)² = 9604 rows
+    assert sample_rows_for_error(0.01) == 9604
+    assert sample_rows_for_error(0.05) < sample_rows_for_error(0.01)
+
+
+def test_required_sample_percent():
+    assert required_sample_percent(1_000_000, 0.01) == pytest.approx(0.9604)
+    # min_sample_rows 가 더 크면 그쪽 기준
+    assert required_sample_percent(1_000_000, 0.01, min_sample_rows=50000) == pytest.approx(5.0)
+    # 필요한 표본보다 작은 테이블은 전체를 읽음
+    assert required_sample_percent(5000, 0.01) == 100.0
+    assert required_sample_percent(0, 0.01) == 100.0
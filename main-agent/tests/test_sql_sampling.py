@@ -0,0 +1,59 @@
+from utils.sql_sampling import apply_tablesample, build_sampled_sql, cte_names, find_driving_table, strip_sql
+
+
+def test_plain_table_gets_tablesample():
+    sql = "SELECT * FROM orders o WHERE o.amount > 0"
+    assert find_driving_table(sql) == ("orders", len("SELECT * FROM orders o"))
+    assert "FROM orders o TABLESAMPLE SYSTEM" in apply_tablesample(sql, "system", 10, 42)
+
+
+def test_cte_reference_is_not_sampleable():
+    sql = "WITH t AS (SELECT * FROM orders) SELECT * FROM t"
+    assert cte_names(sql) == {"t"}
+    assert find_driving_table(sql) is None
+
+    sampled, info = build_sampled_sql(sql, {"method": "system", "target_rows": 100}, result_rows=10000)
+    assert info["method"] == "hash"
+    assert "TABLESAMPLE" not in sampled
+    assert "hashtextextended" in sampled
+
+
+def test_multiple_and_recursive_ctes():
+    sql = ('WITH RECURSIVE a(x) AS (SELECT 1), "B" AS MATERIALIZED (SELECT \'(\' AS p) '
+           'SELECT * FROM "B" JOIN a ON true')
+    assert cte_names(sql) == {"a", "B"}
+    assert find_driving_table(sql) is None
+
+
+def test_table_after_with_clause_is_sampleable():
+    sql = "WITH t AS (SELECT 1) SELECT * FROM orders JOIN t ON true"
+    assert find_driving_table(sql)[0] == "orders"
+
+
+def test_set_returning_function_is_not_sampleable():
+    assert find_driving_table("SELECT * FROM generate_series(1, 10) g") is None
+
+
+def test_keywords_are_not_read_as_alias():
+    for clause in ("OFFSET 5", "FETCH FIRST 5 ROWS ONLY", "EXCEPT SELECT * FROM b",
+                   "INTERSECT SELECT * FROM b", "FOR UPDATE"):
+        sql = f"SELECT * FROM t {clause}"
+        table, insert_at = find_driving_table(sql)
+        assert table == "t"
+        assert sql[insert_at:].strip() == clause
+
+
+def test_strip_sql_drops_trailing_comments_and_semicolons():
+    assert strip_sql("SELECT 1 -- total\n") == "SELECT 1"
+    assert strip_sql("SELECT 1; -- done") == "SELECT 1"
+    assert strip_sql("SELECT 1 /* note */ ;\n\n") == "SELECT 1"
+    # 리터럴 / 중간 주석은 그대로
+    assert strip_sql("SELECT '--x;' AS a") == "SELECT '--x;' AS a"
+    assert strip_sql("SELECT a -- first\n, b FROM t") == "SELECT a -- first\n, b FROM t"
+
+
+def test_wrapped_sql_with_trailing_comment():
+    sql = "WITH t AS (SELECT * FROM orders) SELECT * FROM t -- recent orders"
+    sampled, _ = build_sampled_sql(sql, {"method": "hash", "target_rows": 100}, result_rows=10000)
+    assert "-- recent orders" not in sampled
+    assert "FROM t) AS _s" in sampled
@@ -0,0 +1,25 @@
+from utils.table_names import foreign_key_edges, split_column_ref, split_table_name, table_name
+
+
+def test_public_tables_keep_bare_names():
+    assert table_name("public", "orders") == "orders"
+    assert split_table_name("orders") == ("public", "orders")
+
+
+def test_non_public_schema_names():
+    assert table_name("sales", "orders") == "sales.orders"
+    assert split_table_name("sales.orders") == ("sales", "orders")
+    assert split_column_ref("sales.orders.customer_id") == ("sales.orders", "customer_id")
+    assert split_column_ref("orders.customer_id") == ("orders", "customer_id")
+
+
+def test_foreign_key_edges_with_non_public_schema():
+    metadata = {
+        "sales.orders": {"schema": {"columns": {
+            "id": {"type": "integer", "pk": True},
+            "customer_id": {"type": "integer", "fk": "crm.customers.id", "nullable": False},
+            "product_id": {"type": "integer", "fk": "products.id"},
+        }}},
+    }
+    edges = [(ref, src) for ref, src, _ in foreign_key_edges(metadata)]
+    assert edges == [("crm.customers", "sales.orders"), ("products", "sales.orders")]
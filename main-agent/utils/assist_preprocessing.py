@@ -7,6 +7,20 @@ def drop_nulls(df: pd.DataFrame) -> pd.DataFrame:
         raise ValueError("All rows removed after dropping nulls.")
     return df
 
+def to_numpy_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Typed fetch engines (stream / copy) return pandas nullable dtypes (Int64, boolean).
+    Convert them to plain NumPy dtypes so downstream estimators accept them.
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_extension_array_dtype(dtype) and dtype.kind in "iub":
+            if df[col].isna().any():
+                df[col] = df[col].astype("float64")
+            else:
+                df[col] = df[col].astype(bool if dtype.kind == "b" else "int64")
+    return df
+
 def normalize_covariates(df: pd.DataFrame, treatment: str, outcome: str) -> pd.DataFrame:
     reserved_cols = [col for col in [treatment, outcome] if col in df.columns]
     num_cols = [col for col in df.select_dtypes(include="number").columns if col not in reserved_cols]
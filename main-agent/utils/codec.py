@@ -0,0 +1,75 @@
+# utils/codec.py
+# Compact binary encoding for values stored in Redis (metadata, table_relations):
+# orjson (default) or msgpack, zstd-compressed above a size threshold.
+# Blobs start with a 3-byte header; legacy JSON text values are still decoded.
+import os
+import json
+from decimal import Decimal
+
+import orjson
+import zstandard
+
+try:  # optional: msgpack format
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+CODEC_FORMAT = os.getenv("REDIS_CODEC_FORMAT", "orjson")  # "orjson" | "msgpack"
+CODEC_COMPRESS_MIN_BYTES = int(os.getenv("REDIS_CODEC_COMPRESS_MIN_BYTES", 1024))  # smaller payloads stay raw
+CODEC_ZSTD_LEVEL = int(os.getenv("REDIS_CODEC_ZSTD_LEVEL", 3))
+
+_MAGIC = b"\x00"  # legacy JSON text never starts with NUL
+_FORMATS = {"orjson": b"j", "msgpack": b"m"}
+_ZSTD, _RAW = b"z", b"n"
+
+_compressor = zstandard.ZstdCompressor(level=CODEC_ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)  # 기존 json.dumps(default=str) 와 같은 표현
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def _dumps(obj, fmt: str) -> bytes:
+    if fmt == "msgpack":
+        if ormsgpack is None:
+            raise ImportError("REDIS_CODEC_FORMAT=msgpack requires the 'ormsgpack' package.")
+        return ormsgpack.packb(obj, default=_default, option=ormsgpack.OPT_NON_STR_KEYS)
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode(obj, fmt: str = CODEC_FORMAT, compress_min_bytes: int = CODEC_COMPRESS_MIN_BYTES) -> bytes:
+    """obj → header + (optionally zstd-compressed) orjson / msgpack payload."""
+    if fmt not in _FORMATS:
+        raise ValueError(f"Unsupported codec format: {fmt}. Use one of {tuple(_FORMATS)}.")
+    payload = _dumps(obj, fmt)
+    if compress_min_bytes is not None and len(payload) >= compress_min_bytes:
+        return _MAGIC + _FORMATS[fmt] + _ZSTD + _compressor.compress(payload)
+    return _MAGIC + _FORMATS[fmt] + _RAW + payload
+
+
+def decode(blob):
+    """Inverse of `encode`; plain JSON (str or bytes) written before this codec existed is parsed as JSON."""
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return json.loads(blob)
+    if not blob.startswith(_MAGIC):
+        return orjson.loads(blob)
+    fmt, compression, payload = blob[1:2], blob[2:3], blob[3:]
+    if compression == _ZSTD:
+        payload = _decompressor.decompress(payload)
+    if fmt == _FORMATS["msgpack"]:
+        if ormsgpack is None:
+            raise ImportError("Decoding a msgpack value requires the 'ormsgpack' package.")
+        return ormsgpack.unpackb(payload)
+    return orjson.loads(payload)
+
+
+def normalize(obj):
+    """The form `obj` takes after a round-trip through storage (tuples → lists, datetimes → ISO strings)."""
+    return orjson.loads(orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS))
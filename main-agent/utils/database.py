@@ -1,16 +1,523 @@
+import io
+import os
+import time
+import atexit
+import tempfile
+import asyncio
+import re
+import json
+import uuid
+import datetime
+import threading
+import weakref
+from decimal import Decimal
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import asyncpg
+
 from .config import DB_CONFIG, ASYNC_DB_CONFIG
+from .query_cache import cached_query
+from .pg_decode import PG_TYPE_DTYPES, COPY_NULL, csv_to_dataframe
+from .sql_sampling import strip_sql
+
+
+# Pool settings (overridable through the environment)
+POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", 10))
+POOL_MAX_IDLE = float(os.getenv("PG_POOL_MAX_IDLE", 300))  # idle seconds before a connection is recycled
+POOL_HEALTH_CHECK_AFTER = float(os.getenv("PG_POOL_HEALTH_CHECK_AFTER", 30))  # ping connections idle longer than this
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("PG_POOL_CHECKOUT_TIMEOUT", 30))
+
+# Streaming (server-side cursor) settings
+STREAM_ITERSIZE = int(os.getenv("PG_STREAM_ITERSIZE", 10000))  # rows per network round-trip / DataFrame chunk
+
+
+# Python value type → pandas dtype, for rows whose type OIDs are not available (e.g. cached results)
+PY_TYPE_DTYPES = {
+    bool: "boolean",
+    int: "Int64",
+    float: "float64",
+    Decimal: "float64",
+    datetime.date: "datetime64[ns]",
+    datetime.datetime: "datetime64[ns]",
+}
+
+PREPARED_CACHE_SIZE = int(os.getenv("PG_PREPARED_CACHE_SIZE", 100))  # prepared statements kept per connection
+
+# Per-query limits
+QUERY_TIMEOUT_MS = int(os.getenv("PG_QUERY_TIMEOUT_MS", 60000))  # statement_timeout; 0 disables
+QUERY_MAX_ROWS = int(os.getenv("PG_QUERY_MAX_ROWS", 0)) or None  # default row cap; None = unlimited
+
+# EXPLAIN pre-flight thresholds (planner estimates)
+EXPLAIN_MAX_COST = float(os.getenv("PG_EXPLAIN_MAX_COST", 1e7))
+EXPLAIN_MAX_ROWS = float(os.getenv("PG_EXPLAIN_MAX_ROWS", 1e6))
+
+# COPY fetch settings
+COPY_SPOOL_MAX_BYTES = int(os.getenv("PG_COPY_SPOOL_MAX_BYTES", 64 * 1024 * 1024))  # spill COPY output to disk past this
+
+# Read replicas for analytic (read-only) queries
+REPLICA_DSNS = [dsn.strip() for dsn in os.getenv("PG_REPLICA_DSNS", "").split(",") if dsn.strip()]  # libpq DSNs / URIs
+REPLICA_STRATEGY = os.getenv("PG_REPLICA_STRATEGY", "round_robin")  # "round_robin" | "least_connections"
+REPLICA_MAX_LAG = float(os.getenv("PG_REPLICA_MAX_LAG", 30))  # seconds of replay lag before a replica is skipped
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("PG_REPLICA_LAG_CHECK_INTERVAL", 10))  # seconds a lag reading is reused
+REPLICA_RETRY_AFTER = float(os.getenv("PG_REPLICA_RETRY_AFTER", 30))  # seconds a failed replica is skipped
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available within the checkout timeout."""
+
+
+class QueryCostError(Exception):
+    """Raised when EXPLAIN estimates a query to be too expensive to run. Carries the plan summary."""
+
+    def __init__(self, message: str, plan_summary: str):
+        super().__init__(f"{message}\n\nQuery plan (estimated):\n{plan_summary}")
+        self.plan_summary = plan_summary
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query hits its statement_timeout or is cancelled through a QueryHandle."""
+
+    def __init__(self, sql: str, timeout_ms: int = None, cancelled: bool = False):
+        if cancelled:
+            message = "Query was cancelled before it finished."
+        else:
+            message = (
+                f"Query exceeded the statement_timeout of {timeout_ms} ms and was cancelled. "
+                "Make it cheaper: add selective filters, join on indexed keys, avoid cross joins "
+                "and aggregate before joining large tables."
+            )
+        super().__init__(message)
+        self.sql = sql
+        self.timeout_ms = timeout_ms
+        self.cancelled = cancelled
+
+
+class QueryHandle:
+    """
+    Cancellation handle for a running query. Pass it as `handle=` and call `cancel()`
+    from another thread (e.g. a watchdog timer); the backend is stopped with pg_cancel_backend.
+    """
+
+    def __init__(self):
+        self.db_id = None
+        self.backend_pid = None
+        self.dsn = None  # replica the query runs on (None = primary)
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def _attach(self, db_id, backend_pid, dsn=None):
+        with self._lock:
+            self.db_id, self.backend_pid, self.dsn = db_id, backend_pid, dsn
+
+    def _detach(self):
+        with self._lock:
+            self.backend_pid = None
+
+    def cancel(self) -> bool:
+        with self._lock:
+            self.cancelled = True
+            db_id, pid, dsn = self.db_id, self.backend_pid, self.dsn
+        if pid is None:
+            return False
+        # 풀이 고갈된 상황에서도 취소할 수 있도록 별도 연결 사용
+        conn = _connect(db_id, dsn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_cancel_backend(%s)", (pid,))
+                return bool(cur.fetchone()[0])
+        finally:
+            conn.close()
+
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which server (primary or replica DSN) it belongs to."""
+    dsn_target = None
+
+
+def _replica_params(dsn: str) -> dict:
+    """Connection parameters of a replica DSN; user/password/port default to the primary's."""
+    params = psycopg2.extensions.parse_dsn(dsn)
+    return {
+        "port": DB_CONFIG["port"],
+        "user": DB_CONFIG["user"],
+        "password": DB_CONFIG["password"],
+        **params,
+    }
+
+
+def _connect(db_id=None, dsn=None, **kwargs):
+    """Opens a connection to the primary, or to the replica `dsn` (database taken from `db_id`)."""
+    if dsn is None:
+        params = {key: DB_CONFIG[key] for key in ("host", "port", "user", "password")}
+    else:
+        params = _replica_params(dsn)
+    params["dbname"] = db_id or DB_CONFIG["dbname"]
+    conn = psycopg2.connect(connection_factory=_PooledConnection, **params, **kwargs)
+    conn.dsn_target = dsn
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool for a single database.
+
+    - Keeps between `min_size` and `max_size` connections open.
+    - Connections idle longer than `max_idle` seconds are closed (down to `min_size`).
+    - Connections idle longer than `health_check_after` seconds are pinged before reuse.
+    - Callers block up to `timeout` seconds when the pool is exhausted.
+    """
+
+    def __init__(self, db_id=None, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 max_idle=POOL_MAX_IDLE, health_check_after=POOL_HEALTH_CHECK_AFTER,
+                 timeout=POOL_CHECKOUT_TIMEOUT, dsn=None):
+        self.db_id = db_id
+        self.dsn = dsn  # replica DSN, None for the primary
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+
+        self._idle = deque()  # (conn, last_used) — most recently returned on the right
+        self._prepared = {}  # id(conn) → OrderedDict(statement key → name), per-session prepared statements
+        self._size = 0  # open connections, idle + checked out
+        self._cond = threading.Condition()
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+        }
+
+        for _ in range(min(self.min_size, self.max_size)):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    def _create(self):
+        conn = _connect(self.db_id, self.dsn)
+        self._metrics["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._prepared.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
 
+    def _prune_idle(self, now: float):
+        # 오래 쉬고 있는 커넥션부터 정리 (min_size 는 유지)
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._discard(conn)
+            self._size -= 1
+            self._metrics["recycled"] += 1
+
+    def prepared_statements(self, conn) -> OrderedDict:
+        """Prepared statements that exist on `conn`'s server session (LRU ordered)."""
+        return self._prepared.setdefault(id(conn), OrderedDict())
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                self._prune_idle(time.monotonic())
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # 슬롯만 예약하고 실제 연결은 lock 밖에서 생성
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No connection available for '{self.db_id}' within {self.timeout}s "
+                        f"(max_size={self.max_size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                conn = self._create()
+            elif conn.closed or (
+                time.monotonic() - last_used > self.health_check_after and not self._is_healthy(conn)
+            ):
+                self._metrics["health_check_failures"] += 1
+                self._discard(conn)
+                conn = self._create()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        wait_time = time.monotonic() - start
+        with self._cond:
+            self._metrics["checkouts"] += 1
+            if waited:
+                self._metrics["waits"] += 1
+            self._metrics["wait_time_total"] += wait_time
+            self._metrics["wait_time_max"] = max(self._metrics["wait_time_max"], wait_time)
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        if not discard and not conn.closed:
+            try:
+                # 읽기 전용 사용을 가정: 남은 트랜잭션은 롤백하고 재사용
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed:
+                self._discard(conn)
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._prune_idle(time.monotonic())
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._discard(conn)
+                self._size -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            checkouts = self._metrics["checkouts"]
+            return {
+                **self._metrics,
+                "wait_time_avg": self._metrics["wait_time_total"] / checkouts if checkouts else 0.0,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+# ------------------------ Process-wide pool registry ------------------------
+_pools = {}  # (db_id, replica dsn or None) → ConnectionPool
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(db_id=None, dsn=None) -> ConnectionPool:
+    """Returns the process-wide pool for `db_id` on the primary (or on replica `dsn`), creating it on first use."""
+    global _pools_pid
+    db_id = db_id or DB_CONFIG["dbname"]
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # fork 된 자식 프로세스는 부모의 소켓을 공유하면 안 됨
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get((db_id, dsn))
+        if pool is None:
+            pool = ConnectionPool(db_id, dsn=dsn)
+            _pools[(db_id, dsn)] = pool
+        return pool
+
+
+def _replica_label(dsn: str) -> str:
+    params = psycopg2.extensions.parse_dsn(dsn)
+    return f"{params.get('host', '?')}:{params.get('port', DB_CONFIG['port'])}"
+
+
+def pool_metrics() -> dict:
+    """Per-db_id pool statistics (checkouts, wait times, sizes, recycles); replica pools as `db_id@host:port`."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {
+        db_id if dsn is None else f"{db_id}@{_replica_label(dsn)}": pool.stats()
+        for (db_id, dsn), pool in pools.items()
+    }
+
+
+@atexit.register
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# ------------------------ Read-replica routing ------------------------
+# 복제 지연(초): 재생할 WAL 이 남아 있을 때만 마지막 재생 트랜잭션 시각과 비교
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def _sync_in_use(db_id, dsn) -> int:
+    with _pools_lock:
+        pool = _pools.get((db_id, dsn))
+    return pool.stats()["in_use"] if pool else 0
+
+
+class ReplicaRouter:
+    """
+    Picks a read replica for read-only queries.
+
+    - strategy "round_robin" rotates over eligible replicas; "least_connections" picks the one
+      with the fewest checked-out pooled connections
+    - replicas whose replay lag exceeds `max_lag` seconds are skipped (lag readings are reused
+      for `lag_check_interval` seconds)
+    - replicas that failed to connect are skipped for `retry_after` seconds
+    - `choose()` returns None — i.e. use the primary — when no replica is eligible
+    """
+
+    STRATEGIES = ("round_robin", "least_connections")
+
+    def __init__(self, dsns=None, strategy=REPLICA_STRATEGY, max_lag=REPLICA_MAX_LAG,
+                 lag_check_interval=REPLICA_LAG_CHECK_INTERVAL, retry_after=REPLICA_RETRY_AFTER):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unsupported replica strategy: {strategy}. Use one of {self.STRATEGIES}.")
+        self.dsns = list(REPLICA_DSNS if dsns is None else dsns)
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.retry_after = retry_after
+
+        self._next = 0
+        self._lag = {}  # (db_id, dsn) → (lag seconds, checked_at)
+        self._failed = {}  # dsn → failed_at
+        self._lock = threading.Lock()
+        self._metrics = {"replica": 0, "primary_fallback": 0, "lag_skips": 0, "failures": 0}
+
+    def replica_lag(self, db_id, dsn) -> float:
+        """Replay lag of replica `dsn` in seconds (inf when it cannot be reached)."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._lag.get((db_id, dsn))
+        if cached and now - cached[1] < self.lag_check_interval:
+            return cached[0]
+        try:
+            conn = _connect(db_id, dsn, connect_timeout=5)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICA_LAG_SQL)
+                    lag = float(cur.fetchone()[0] or 0)
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            print(f"⚠️ Replica {_replica_label(dsn)} lag check failed: {e}")
+            self.mark_failed(dsn)
+            lag = float("inf")
+        with self._lock:
+            self._lag[(db_id, dsn)] = (lag, now)
+        return lag
+
+    def mark_failed(self, dsn):
+        with self._lock:
+            self._failed[dsn] = time.monotonic()
+            self._metrics["failures"] += 1
+
+    def choose(self, db_id=None, in_use=_sync_in_use):
+        """Replica DSN for the next read-only query on `db_id`, or None for the primary."""
+        db_id = db_id or DB_CONFIG["dbname"]
+        now = time.monotonic()
+        with self._lock:
+            candidates = [dsn for dsn in self.dsns if now - self._failed.get(dsn, -self.retry_after) >= self.retry_after]
+
+        eligible = []
+        for dsn in candidates:
+            if self.replica_lag(db_id, dsn) <= self.max_lag:
+                eligible.append(dsn)
+            else:
+                with self._lock:
+                    self._metrics["lag_skips"] += 1
+
+        with self._lock:
+            if not eligible:
+                self._metrics["primary_fallback"] += 1
+                return None
+            self._metrics["replica"] += 1
+            if self.strategy == "least_connections":
+                return min(eligible, key=lambda dsn: in_use(db_id, dsn))
+            self._next += 1
+            return eligible[self._next % len(eligible)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._metrics,
+                "strategy": self.strategy,
+                "lag": {f"{db_id}@{_replica_label(dsn)}": lag for (db_id, dsn), (lag, _) in self._lag.items()},
+            }
+
+
+replica_router = ReplicaRouter()
+
+
+@contextmanager
+def get_pg_conn(db_id=None, readonly=False):
+    """
+    Checks a connection out of the pool for `db_id` and returns it on exit.
+    With `readonly=True` the connection comes from a read replica when one is configured
+    and eligible, falling back to the primary otherwise.
+
+        with get_pg_conn(db_id) as conn:
+            ...
+    """
+    db_id = db_id or DB_CONFIG["dbname"]
+    conn = None
+    dsn = replica_router.choose(db_id) if readonly and replica_router.dsns else None
+    if dsn is not None:
+        try:
+            pool = get_pool(db_id, dsn)
+            conn = pool.getconn()
+        except psycopg2.OperationalError as e:
+            print(f"⚠️ Replica {_replica_label(dsn)} unavailable, using the primary: {e}")
+            replica_router.mark_failed(dsn)
+    if conn is None:
+        pool = get_pool(db_id)
+        conn = pool.getconn()
+    try:
+        yield conn
+    except psycopg2.OperationalError:
+        pool.putconn(conn, discard=True)
+        raise
+    except BaseException:
+        pool.putconn(conn)
+        raise
+    else:
+        pool.putconn(conn)
 
-def get_pg_conn(db_id=None):
-    return psycopg2.connect(
-        host=DB_CONFIG["host"],
-        port=DB_CONFIG["port"],
-        dbname=db_id or DB_CONFIG["dbname"],
-        user=DB_CONFIG["user"],
-        password=DB_CONFIG["password"]
-    )
 
 async def get_async_pg_conn(db_id=None):
     config = ASYNC_DB_CONFIG.copy()
@@ -18,12 +525,574 @@ async def get_async_pg_conn(db_id=None):
         config["database"] = db_id
     return await asyncpg.connect(**config)
 
-def run_postgres_query(db_id: str, sql: str):
-    conn = get_pg_conn(db_id)
-    cur = conn.cursor()
-    cur.execute(sql)
-    rows = cur.fetchall()
-    column_names = [desc[0] for desc in cur.description]
-    cur.close()
-    conn.close()
-    return rows, column_names
\ No newline at end of file
+@contextmanager
+def _query_guard(conn, db_id, sql, timeout_ms=None, handle=None):
+    """Applies statement_timeout for the current transaction and maps cancellations to QueryTimeoutError."""
+    if handle is not None and handle.cancelled:
+        raise QueryTimeoutError(sql, timeout_ms, cancelled=True)
+    if timeout_ms:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+    if handle is not None:
+        handle._attach(db_id, conn.get_backend_pid(), getattr(conn, "dsn_target", None))
+    try:
+        yield
+    except psycopg2.errors.QueryCanceled as e:
+        raise QueryTimeoutError(sql, timeout_ms, cancelled=handle is not None and handle.cancelled) from e
+    finally:
+        if handle is not None:
+            handle._detach()
+
+
+def _execute_query(db_id: str, sql: str, timeout_ms=QUERY_TIMEOUT_MS, max_rows=None, handle=None, readonly=False):
+    with get_pg_conn(db_id, readonly=readonly) as conn:
+        with _query_guard(conn, db_id, sql, timeout_ms, handle):
+            if max_rows is None:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    rows = cur.fetchall()
+                    column_names = [desc[0] for desc in cur.description]
+            else:
+                # server-side cursor: max_rows 까지만 가져오고 나머지는 서버에서 버림
+                with conn.cursor(name=f"capped_{uuid.uuid4().hex}") as cur:
+                    cur.execute(sql)
+                    rows = cur.fetchmany(max_rows + 1)
+                    column_names = [desc[0] for desc in cur.description]
+                if len(rows) > max_rows:
+                    print(f"⚠️ Result truncated to {max_rows} rows.")
+                    rows = rows[:max_rows]
+    return rows, column_names
+
+def run_postgres_query(db_id: str, sql: str, use_cache: bool = True, timeout_ms: int = QUERY_TIMEOUT_MS,
+                       max_rows: int = QUERY_MAX_ROWS, handle: QueryHandle = None, readonly: bool = False):
+    """
+    Runs `sql` and returns (rows, column_names). Read-only results go through the result cache.
+
+    - timeout_ms: statement_timeout for this query (QueryTimeoutError when exceeded)
+    - max_rows: stop fetching after this many rows
+    - handle: QueryHandle a watchdog can use to cancel the running query
+    - readonly: route to a read replica when one is available
+    """
+    execute = lambda: _execute_query(db_id, sql, timeout_ms=timeout_ms, max_rows=max_rows, handle=handle,
+                                     readonly=readonly)
+    if not use_cache:
+        return execute()
+    return cached_query(db_id, sql, execute, max_rows=max_rows)
+
+
+# ------------------------ Async (asyncpg) pool ------------------------
+# asyncpg 풀은 event loop 에 묶여 있으므로 loop 별로 {(db_id, dsn): 풀 생성 task} 를 보관
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def _evict_closed_loop_pools():
+    """Drops the pools of event loops that have been closed (e.g. after each asyncio.run)."""
+    for loop in [loop for loop in list(_async_pools) if loop.is_closed()]:
+        for task in _async_pools.pop(loop, {}).values():
+            if task.done() and not task.cancelled() and not task.exception():
+                try:
+                    task.result().terminate()
+                except Exception:
+                    pass  # loop 이 이미 닫혀 정상 종료 불가 → 참조만 끊고 GC 가 소켓 정리
+
+
+def _loop_pools(loop) -> dict:
+    _evict_closed_loop_pools()
+    pools = _async_pools.get(loop)
+    if pools is None:
+        pools = _async_pools[loop] = {}
+    return pools
+
+
+async def get_async_pool(db_id=None, dsn=None) -> asyncpg.Pool:
+    """Returns the shared asyncpg pool for `db_id` (on replica `dsn` if given) on the running event loop."""
+    loop = asyncio.get_running_loop()
+    pools = _loop_pools(loop)
+    key = (db_id or ASYNC_DB_CONFIG.get("database"), dsn)
+    task = pools.get(key)
+    if task is None:
+        config = ASYNC_DB_CONFIG.copy()
+        if db_id:
+            config["database"] = db_id
+        if dsn is not None:
+            params = _replica_params(dsn)
+            config.update(host=params.get("host"), port=int(params["port"]),
+                          user=params["user"], password=params["password"])
+        # 동시에 들어온 요청들이 같은 풀 생성을 기다리도록 task 자체를 저장
+        task = loop.create_task(asyncpg.create_pool(
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=POOL_MAX_IDLE,
+            **config
+        ))
+        pools[key] = task
+    try:
+        return await task
+    except Exception:
+        pools.pop(key, None)
+        raise
+
+
+async def get_async_read_pool(db_id=None, readonly=False) -> asyncpg.Pool:
+    """Async counterpart of the replica routing in `get_pg_conn`: replica pool when eligible, else the primary's."""
+    if readonly and replica_router.dsns:
+        db_id = db_id or DB_CONFIG["dbname"]
+        pools = _loop_pools(asyncio.get_running_loop())
+
+        def in_use(db, dsn):
+            task = pools.get((db, dsn))
+            if task is None or not task.done() or task.exception():
+                return 0
+            pool = task.result()
+            return pool.get_size() - pool.get_idle_size()
+
+        # 지연 측정이 동기 연결을 쓰므로 event loop 밖에서 선택
+        dsn = await asyncio.to_thread(replica_router.choose, db_id, in_use)
+        if dsn is not None:
+            try:
+                return await get_async_pool(db_id, dsn)
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"⚠️ Replica {_replica_label(dsn)} unavailable, using the primary: {e}")
+                replica_router.mark_failed(dsn)
+    return await get_async_pool(db_id)
+
+
+async def close_async_pools():
+    """
+    Closes the asyncpg pools that belong to the running event loop. Call it before the loop ends
+    (e.g. at the end of the coroutine given to asyncio.run); pools of loops closed without it are
+    terminated and dropped on the next pool lookup.
+    """
+    for task in _async_pools.pop(asyncio.get_running_loop(), {}).values():
+        if task.done() and not task.cancelled() and not task.exception():
+            await task.result().close()
+
+
+async def _set_async_timeout(conn, timeout_ms):
+    if timeout_ms:
+        await conn.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+async def run_query_async(db_id: str, sql: str, timeout_ms: int = QUERY_TIMEOUT_MS, max_rows: int = QUERY_MAX_ROWS,
+                          readonly: bool = False):
+    """Async counterpart of `run_postgres_query`; returns (rows, column_names)."""
+    pool = await get_async_read_pool(db_id, readonly)
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await _set_async_timeout(conn, timeout_ms)
+                stmt = await conn.prepare(sql)
+                column_names = [attr.name for attr in stmt.get_attributes()]
+                if max_rows is None:
+                    records = await stmt.fetch()
+                else:
+                    cursor = await stmt.cursor()
+                    records = await cursor.fetch(max_rows + 1)
+    except asyncpg.exceptions.QueryCanceledError as e:
+        raise QueryTimeoutError(sql, timeout_ms) from e
+
+    if max_rows is not None and len(records) > max_rows:
+        print(f"⚠️ Result truncated to {max_rows} rows.")
+        records = records[:max_rows]
+    return [tuple(r) for r in records], column_names
+
+
+# ------------------------ Streaming fetch ------------------------
+def _column_to_series(values, dtype, name) -> pd.Series:
+    if dtype is None:
+        return pd.Series(values, name=name, dtype=object)
+    if dtype.startswith("datetime64"):
+        return pd.Series(pd.to_datetime(values, utc=dtype.endswith("UTC]")), name=name)
+    if dtype == "float64":
+        # numeric 은 Decimal 로 오므로 float 로 변환
+        return pd.Series([None if v is None else float(v) for v in values], name=name, dtype="float64")
+    return pd.Series(values, name=name, dtype=dtype)
+
+
+def rows_to_dataframe(rows, columns, type_oids) -> pd.DataFrame:
+    """Builds a typed DataFrame from a chunk of row tuples, one column at a time."""
+    if not rows:
+        return pd.DataFrame({
+            name: pd.Series([], dtype=PG_TYPE_DTYPES.get(oid, object)) for name, oid in zip(columns, type_oids)
+        })
+    col_values = list(zip(*rows))
+    return pd.DataFrame({
+        name: _column_to_series(list(values), PG_TYPE_DTYPES.get(oid), name)
+        for name, oid, values in zip(columns, type_oids, col_values)
+    })
+
+
+def _infer_dtype(values):
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, datetime.datetime) and sample.tzinfo is not None:
+        return "datetime64[ns, UTC]"
+    return PY_TYPE_DTYPES.get(type(sample))
+
+
+def decode_rows(rows, columns) -> pd.DataFrame:
+    """Typed DataFrame from row tuples when only Python values are known (dtype inferred per column)."""
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    col_values = list(zip(*rows))
+    return pd.DataFrame({
+        name: _column_to_series(list(values), _infer_dtype(values), name)
+        for name, values in zip(columns, col_values)
+    })
+
+
+def _concat_chunks(chunks) -> pd.DataFrame:
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    chunks.clear()
+    return df
+
+
+def fetch_dataframe_streaming(db_id: str, sql: str, itersize: int = STREAM_ITERSIZE,
+                              timeout_ms: int = QUERY_TIMEOUT_MS, handle: QueryHandle = None,
+                              readonly: bool = False) -> pd.DataFrame:
+    """
+    Runs `sql` through a named (server-side) cursor and builds the DataFrame in typed
+    chunks of `itersize` rows, so at most one chunk is held as Python row tuples at a time.
+    """
+    chunks = []
+    with get_pg_conn(db_id, readonly=readonly) as conn, _query_guard(conn, db_id, sql, timeout_ms, handle):
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(sql)
+            columns, type_oids = None, None
+            while True:
+                rows = cur.fetchmany(itersize)
+                if columns is None:
+                    columns = [desc[0] for desc in cur.description]
+                    type_oids = [desc[1] for desc in cur.description]
+                if not rows:
+                    break
+                chunks.append(rows_to_dataframe(rows, columns, type_oids))
+                del rows
+    if not chunks:
+        return rows_to_dataframe([], columns, type_oids)
+    return _concat_chunks(chunks)
+
+
+async def fetch_dataframe_streaming_async(db_id: str, sql: str, itersize: int = STREAM_ITERSIZE,
+                                          timeout_ms: int = QUERY_TIMEOUT_MS, readonly: bool = False) -> pd.DataFrame:
+    """Async counterpart of `fetch_dataframe_streaming` using an asyncpg cursor."""
+    pool = await get_async_read_pool(db_id, readonly)
+    chunks = []
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                await _set_async_timeout(conn, timeout_ms)
+                stmt = await conn.prepare(sql)
+                attrs = stmt.get_attributes()
+                columns = [attr.name for attr in attrs]
+                type_oids = [attr.type.oid for attr in attrs]
+                cursor = await stmt.cursor()
+                while True:
+                    records = await cursor.fetch(itersize)
+                    if not records:
+                        break
+                    chunks.append(rows_to_dataframe([tuple(r) for r in records], columns, type_oids))
+                    del records
+    except asyncpg.exceptions.QueryCanceledError as e:
+        raise QueryTimeoutError(sql, timeout_ms) from e
+    if not chunks:
+        return rows_to_dataframe([], columns, type_oids)
+    return _concat_chunks(chunks)
+
+
+# ------------------------ COPY-based columnar fetch ------------------------
+def _copy_command(sql: str) -> str:
+    return f"COPY ({strip_sql(sql)}) TO STDOUT WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+
+def fetch_dataframe_copy(db_id: str, sql: str, timeout_ms: int = QUERY_TIMEOUT_MS,
+                         handle: QueryHandle = None, readonly: bool = False) -> pd.DataFrame:
+    """
+    Fetches the result of `sql` with `COPY (...) TO STDOUT` (CSV) instead of the row protocol
+    and parses it straight into typed columns. Output larger than COPY_SPOOL_MAX_BYTES is
+    spooled to a temporary file.
+    """
+    with get_pg_conn(db_id, readonly=readonly) as conn, _query_guard(conn, db_id, sql, timeout_ms, handle):
+        with conn.cursor() as cur:
+            # 결과 컬럼/타입만 먼저 확인
+            cur.execute(f"SELECT * FROM ({strip_sql(sql)}) AS _q LIMIT 0")
+            columns = [desc[0] for desc in cur.description]
+            type_oids = [desc[1] for desc in cur.description]
+
+            with tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_MAX_BYTES) as buf:
+                cur.copy_expert(_copy_command(sql), buf)
+                buf.seek(0)
+                if buf.read(1) == b"":
+                    return rows_to_dataframe([], columns, type_oids)
+                buf.seek(0)
+                return csv_to_dataframe(buf, columns, type_oids)
+
+
+async def fetch_dataframe_copy_async(db_id: str, sql: str, timeout_ms: int = QUERY_TIMEOUT_MS,
+                                     readonly: bool = False) -> pd.DataFrame:
+    """Async counterpart of `fetch_dataframe_copy` using asyncpg's COPY support."""
+    pool = await get_async_read_pool(db_id, readonly)
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                await _set_async_timeout(conn, timeout_ms)
+                stmt = await conn.prepare(strip_sql(sql))
+                attrs = stmt.get_attributes()
+                columns = [attr.name for attr in attrs]
+                type_oids = [attr.type.oid for attr in attrs]
+
+                buf = io.BytesIO()
+                await conn.copy_from_query(strip_sql(sql), output=buf, format="csv", null=COPY_NULL)
+    except asyncpg.exceptions.QueryCanceledError as e:
+        raise QueryTimeoutError(sql, timeout_ms) from e
+    if buf.getbuffer().nbytes == 0:
+        return rows_to_dataframe([], columns, type_oids)
+    buf.seek(0)
+    return csv_to_dataframe(buf, columns, type_oids)
+
+
+# ------------------------ EXPLAIN pre-flight ------------------------
+def summarize_plan(plan: dict, max_nodes: int = 20) -> str:
+    """Indented one-line-per-node summary of an EXPLAIN (FORMAT JSON) plan, for the LLM."""
+    lines = []
+
+    def walk(node, depth):
+        if len(lines) >= max_nodes:
+            return
+        label = node.get("Node Type", "?")
+        if node.get("Join Type"):
+            label = f"{node['Join Type']} {label}"
+        if node.get("Relation Name"):
+            label += f" on {node['Relation Name']}"
+        detail = f"cost={node.get('Total Cost', 0):.0f}, rows={node.get('Plan Rows', 0):.0f}"
+        cond = node.get("Hash Cond") or node.get("Merge Cond") or node.get("Join Filter") or node.get("Filter")
+        if cond:
+            detail += f", cond={cond}"
+        elif node.get("Node Type") == "Nested Loop" and not any("Index Cond" in c for c in node.get("Plans", [])):
+            detail += ", no join condition (possible cross join)"
+        lines.append(f"{'  ' * depth}-> {label} ({detail})")
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan, 0)
+    return "\n".join(lines)
+
+
+def _parse_explain(raw) -> dict:
+    doc = json.loads(raw) if isinstance(raw, str) else raw
+    return doc[0]["Plan"]
+
+
+def _check_plan(plan: dict, max_cost: float, max_rows: float) -> dict:
+    cost, rows = plan.get("Total Cost", 0), plan.get("Plan Rows", 0)
+    problems = []
+    if max_cost is not None and cost > max_cost:
+        problems.append(f"estimated cost {cost:.0f} exceeds limit {max_cost:.0f}")
+    if max_rows is not None and rows > max_rows:
+        problems.append(f"estimated rows {rows:.0f} exceed limit {max_rows:.0f}")
+    if problems:
+        raise QueryCostError(
+            "Query rejected before execution: " + "; ".join(problems)
+            + ". Add join conditions, filters or aggregation to reduce the work.",
+            summarize_plan(plan)
+        )
+    return plan
+
+
+def explain_query(db_id: str, sql: str, readonly: bool = False) -> dict:
+    """Runs EXPLAIN (FORMAT JSON) without executing the query and returns the root plan node."""
+    with get_pg_conn(db_id, readonly=readonly) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"EXPLAIN (FORMAT JSON) {strip_sql(sql)}")
+            return _parse_explain(cur.fetchone()[0])
+
+
+def check_query_cost(db_id: str, sql: str, max_cost: float = EXPLAIN_MAX_COST, max_rows: float = EXPLAIN_MAX_ROWS,
+                     readonly: bool = False) -> dict:
+    """Pre-flight gate: raises QueryCostError when the estimated plan exceeds the thresholds."""
+    return _check_plan(explain_query(db_id, sql, readonly=readonly), max_cost, max_rows)
+
+
+async def explain_query_async(db_id: str, sql: str, readonly: bool = False) -> dict:
+    pool = await get_async_read_pool(db_id, readonly)
+    async with pool.acquire() as conn:
+        raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {strip_sql(sql)}")
+    return _parse_explain(raw)
+
+
+async def check_query_cost_async(db_id: str, sql: str, max_cost: float = EXPLAIN_MAX_COST, max_rows: float = EXPLAIN_MAX_ROWS,
+                                 readonly: bool = False) -> dict:
+    return _check_plan(await explain_query_async(db_id, sql, readonly=readonly), max_cost, max_rows)
+
+
+# ------------------------ Database (shared entry point) ------------------------
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+def _to_server_placeholders(sql: str) -> str:
+    """psycopg2 style `%s` placeholders → PostgreSQL `$n` placeholders (for PREPARE)."""
+    counter = iter(range(1, 10_000))
+    return _PLACEHOLDER.sub(lambda m: "%" if m.group(0) == "%%" else f"${next(counter)}", sql)
+
+
+class Database:
+    """
+    Single entry point for query execution shared by text2sql, causal analysis and data_prep.
+
+    - pooled sync (psycopg2) and async (asyncpg) connections per db_id
+    - `readonly=True` routes analytic queries to read replicas (see ReplicaRouter)
+    - server-side prepared statements for parameterized queries, cached per pooled connection
+    - typed DataFrame decoding (fetchall / stream / copy)
+    - per-query timing metrics (`metrics()`)
+    """
+
+    def __init__(self, default_db_id: str = None):
+        self.default_db_id = default_db_id
+        self._timings = {}
+        self._timings_lock = threading.Lock()
+
+    # ---- metrics ----
+    @contextmanager
+    def _timed(self, db_id, kind):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._timings_lock:
+                t = self._timings.setdefault((db_id, kind), {
+                    "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0
+                })
+                t["count"] += 1
+                t["errors"] += failed
+                t["total_ms"] += elapsed_ms
+                t["max_ms"] = max(t["max_ms"], elapsed_ms)
+                t["last_ms"] = elapsed_ms
+
+    def metrics(self) -> dict:
+        with self._timings_lock:
+            queries = {
+                f"{db_id}:{kind}": {**t, "avg_ms": t["total_ms"] / t["count"] if t["count"] else 0.0}
+                for (db_id, kind), t in self._timings.items()
+            }
+        return {"queries": queries, "pools": pool_metrics(), "replicas": replica_router.stats()}
+
+    def _db(self, db_id):
+        return db_id or self.default_db_id or DB_CONFIG["dbname"]
+
+    # ---- connections ----
+    def connection(self, db_id: str = None, readonly: bool = False):
+        """Pooled psycopg2 connection: `with database.connection(db_id) as conn: ...`"""
+        return get_pg_conn(self._db(db_id), readonly=readonly)
+
+    # ---- sync queries ----
+    def _execute_prepared(self, db_id, sql, params, timeout_ms, handle, readonly):
+        key = _to_server_placeholders(sql)
+        with get_pg_conn(db_id, readonly=readonly) as conn, _query_guard(conn, db_id, sql, timeout_ms, handle):
+            prepared = get_pool(db_id, conn.dsn_target).prepared_statements(conn)
+            with conn.cursor() as cur:
+                name = prepared.get(key)
+                if name is None:
+                    name = f"stmt_{uuid.uuid4().hex[:16]}"
+                    cur.execute(f"PREPARE {name} AS {key}")
+                    prepared[key] = name
+                    if len(prepared) > PREPARED_CACHE_SIZE:
+                        _, old = prepared.popitem(last=False)
+                        cur.execute(f"DEALLOCATE {old}")
+                else:
+                    prepared.move_to_end(key)
+                placeholders = ", ".join(["%s"] * len(params))
+                cur.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", tuple(params))
+                rows = cur.fetchall() if cur.description else []
+                column_names = [desc[0] for desc in cur.description] if cur.description else []
+        return rows, column_names
+
+    def run_query(self, sql: str, db_id: str = None, params=None, use_cache: bool = True,
+                  timeout_ms: int = QUERY_TIMEOUT_MS, max_rows: int = QUERY_MAX_ROWS, handle: QueryHandle = None,
+                  readonly: bool = False):
+        """
+        Returns (rows, column_names). With `params` (psycopg2 `%s` placeholders) the statement is
+        prepared once per pooled connection and re-executed with EXECUTE on later calls.
+        """
+        db_id = self._db(db_id)
+        with self._timed(db_id, "query"):
+            if params is not None:
+                return self._execute_prepared(db_id, sql, params, timeout_ms, handle, readonly)
+            return run_postgres_query(db_id, sql, use_cache=use_cache, timeout_ms=timeout_ms,
+                                      max_rows=max_rows, handle=handle, readonly=readonly)
+
+    def fetch_dataframe(self, sql: str, db_id: str = None, mode: str = "fetchall",
+                        itersize: int = STREAM_ITERSIZE, timeout_ms: int = QUERY_TIMEOUT_MS,
+                        handle: QueryHandle = None, readonly: bool = False) -> pd.DataFrame:
+        """
+        Typed DataFrame for `sql`.
+        mode: "fetchall" (cached row fetch) | "stream" (server-side cursor) | "copy" (COPY TO STDOUT)
+        """
+        db_id = self._db(db_id)
+        with self._timed(db_id, f"dataframe:{mode}"):
+            if mode == "stream":
+                return fetch_dataframe_streaming(db_id, sql, itersize=itersize, timeout_ms=timeout_ms,
+                                                 handle=handle, readonly=readonly)
+            if mode == "copy":
+                return fetch_dataframe_copy(db_id, sql, timeout_ms=timeout_ms, handle=handle, readonly=readonly)
+            rows, columns = run_postgres_query(db_id, sql, timeout_ms=timeout_ms, max_rows=None, handle=handle,
+                                               readonly=readonly)
+            return decode_rows(rows, columns)
+
+    def explain(self, sql: str, db_id: str = None, readonly: bool = False) -> dict:
+        """Root node of the estimated plan (EXPLAIN without execution)."""
+        db_id = self._db(db_id)
+        with self._timed(db_id, "explain"):
+            return explain_query(db_id, sql, readonly=readonly)
+
+    def check_query_cost(self, sql: str, db_id: str = None, readonly: bool = False, **limits) -> dict:
+        db_id = self._db(db_id)
+        with self._timed(db_id, "explain"):
+            return check_query_cost(db_id, sql, readonly=readonly, **limits)
+
+    # ---- async queries (asyncpg caches prepared statements per connection itself) ----
+    async def run_query_async(self, sql: str, db_id: str = None, params=None,
+                              timeout_ms: int = QUERY_TIMEOUT_MS, max_rows: int = QUERY_MAX_ROWS,
+                              readonly: bool = False):
+        db_id = self._db(db_id)
+        with self._timed(db_id, "query_async"):
+            if params is None:
+                return await run_query_async(db_id, sql, timeout_ms=timeout_ms, max_rows=max_rows, readonly=readonly)
+            pool = await get_async_read_pool(db_id, readonly)
+            try:
+                async with pool.acquire() as conn:
+                    async with conn.transaction():
+                        await _set_async_timeout(conn, timeout_ms)
+                        stmt = await conn.prepare(_to_server_placeholders(sql))
+                        records = await stmt.fetch(*params)
+                        column_names = [attr.name for attr in stmt.get_attributes()]
+            except asyncpg.exceptions.QueryCanceledError as e:
+                raise QueryTimeoutError(sql, timeout_ms) from e
+            return [tuple(r) for r in records], column_names
+
+    async def fetch_dataframe_async(self, sql: str, db_id: str = None, mode: str = "fetchall",
+                                    itersize: int = STREAM_ITERSIZE, timeout_ms: int = QUERY_TIMEOUT_MS,
+                                    readonly: bool = False) -> pd.DataFrame:
+        db_id = self._db(db_id)
+        with self._timed(db_id, f"dataframe_async:{mode}"):
+            if mode == "stream":
+                return await fetch_dataframe_streaming_async(db_id, sql, itersize=itersize, timeout_ms=timeout_ms,
+                                                             readonly=readonly)
+            if mode == "copy":
+                return await fetch_dataframe_copy_async(db_id, sql, timeout_ms=timeout_ms, readonly=readonly)
+            rows, columns = await run_query_async(db_id, sql, timeout_ms=timeout_ms, max_rows=None, readonly=readonly)
+            return decode_rows(rows, columns)
+
+    async def explain_async(self, sql: str, db_id: str = None, readonly: bool = False) -> dict:
+        db_id = self._db(db_id)
+        with self._timed(db_id, "explain_async"):
+            return await explain_query_async(db_id, sql, readonly=readonly)
+
+    async def check_query_cost_async(self, sql: str, db_id: str = None, readonly: bool = False, **limits) -> dict:
+        db_id = self._db(db_id)
+        with self._timed(db_id, "explain_async"):
+            return await check_query_cost_async(db_id, sql, readonly=readonly, **limits)
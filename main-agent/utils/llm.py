@@ -1,12 +1,18 @@
 import os
 import asyncio
-from typing import Union, Any, overload
+import threading
+import weakref
+from typing import Dict, Union, Any, overload
+
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import BasePromptTemplate
 from langchain_core.output_parsers import BaseOutputParser
 from langchain_core.language_models.chat_models import BaseChatModel
 
+from .llm_cache import get_llm_cache, make_cache_key
+
 
 @overload
 def call_llm(prompt: str, parser: None = None, variables: dict = None, model: str = "gpt-4o-mini", temperature: float = 0.3) -> str: ...
@@ -25,7 +31,8 @@ def call_llm(
     model: str = "gpt-4o-mini",
     temperature: float = 0.3,
     provider: str = "openai",
-    llm: BaseChatModel = None
+    llm: BaseChatModel = None,
+    cache: bool = False
 ) -> Union[str, Any]:
     """
     If `llm` is provided, use it directly. Otherwise, create using model/provider info.
@@ -35,10 +42,18 @@ def call_llm(
     - PromptTemplate → str output
     - PromptTemplate + Parser → structured output (e.g., BaseModel, dict, list)
     Supports OpenAI and Ollama providers.
+
+    `cache=True` serves identical calls from the response cache when one is configured (LLM_CACHE_BACKEND).
+    Off by default: only deterministic call sites (e.g. metadata generation) should opt in — retry
+    loops such as the refiner and review would otherwise replay the same failing output.
     """
     if llm is None:
         llm = get_llm(model=model, temperature=temperature, provider=provider)
 
+    llm_cache = get_llm_cache() if cache else None
+    if llm_cache is not None:
+        return _call_llm_cached(llm_cache, prompt, parser, variables, llm)
+
     # Case 1: PromptTemplate with parser
     if isinstance(prompt, BasePromptTemplate) and parser:
         if not variables:
@@ -69,12 +84,17 @@ async def call_llm_async(
     model: str = "gpt-4o-mini",
     temperature: float = 0.3,
     provider: str = "openai",
-    llm: BaseChatModel = None
+    llm: BaseChatModel = None,
+    cache: bool = False
 ) -> Union[str, Any]:
 
     if llm is None:
         llm = get_llm(model=model, temperature=temperature, provider=provider)
 
+    llm_cache = get_llm_cache() if cache else None
+    if llm_cache is not None:
+        return await _call_llm_cached_async(llm_cache, prompt, parser, variables, llm)
+
     # Case 1: PromptTemplate with parser
     if isinstance(prompt, BasePromptTemplate) and parser:
         if not variables:
@@ -99,19 +119,180 @@ async def call_llm_async(
         raise TypeError("Prompt must be a string or a BasePromptTemplate.")
 
 
-def get_llm(model: str = "gpt-4o-mini", temperature: float = 0.3, provider: str = "openai") -> BaseChatModel:
-    """
-    Returns an LLM instance based on the specified provider.
-    Supports OpenAI and Ollama.
-    """
+# -------------------------------
+# response cache
+# -------------------------------
+# 캐시에는 모델의 원문 응답만 저장하고, parser 는 조회할 때마다 다시 적용 (구조화 출력 재검증)
+_MISS = object()
+
+
+def _render_prompt(prompt: Union[str, BasePromptTemplate], parser: BaseOutputParser, variables: dict):
+    if isinstance(prompt, BasePromptTemplate):
+        if not variables:
+            raise ValueError("PromptTemplate with parser requires input variables." if parser
+                             else "PromptTemplate requires input variables.")
+        return prompt.invoke(variables)
+    elif isinstance(prompt, str):
+        return prompt
+    else:
+        raise TypeError("Prompt must be a string or a BasePromptTemplate.")
+
+
+def _parse_reply(text: str, prompt: Union[str, BasePromptTemplate], parser: BaseOutputParser):
+    if isinstance(prompt, BasePromptTemplate) and parser:
+        return parser.parse(text)
+    return text.strip()
+
+
+def _cache_lookup(llm_cache, key: str, prompt, parser):
+    try:
+        text = llm_cache.get(key)
+    except Exception as e:
+        print(f"⚠️ LLM cache lookup failed: {e}")
+        return _MISS
+    if text is None:
+        return _MISS
+    try:
+        return _parse_reply(text, prompt, parser)
+    except Exception as e:
+        # 현재 parser 로 검증되지 않는 응답 → 버리고 모델 호출
+        print(f"⚠️ Cached LLM response failed validation, calling the model: {e}")
+        try:
+            llm_cache.delete(key)
+        except Exception:
+            pass
+        return _MISS
+
+
+def _cache_store(llm_cache, key: str, text: str):
+    try:
+        llm_cache.set(key, text)
+    except Exception as e:
+        print(f"⚠️ LLM cache store failed: {e}")
+
+
+def _call_llm_cached(llm_cache, prompt, parser, variables, llm):
+    prompt_value = _render_prompt(prompt, parser, variables)
+    key = make_cache_key(llm, prompt_value)
+    result = _cache_lookup(llm_cache, key, prompt, parser)
+    if result is not _MISS:
+        return result
+
+    reply = llm.invoke(prompt_value)
+    text = getattr(reply, "content", reply)  # chat model → message, Ollama LLM → str
+    result = _parse_reply(text, prompt, parser)  # 파싱에 성공한 응답만 저장
+    _cache_store(llm_cache, key, text)
+    return result
+
+
+async def _call_llm_cached_async(llm_cache, prompt, parser, variables, llm):
+    prompt_value = _render_prompt(prompt, parser, variables)
+    key = make_cache_key(llm, prompt_value)
+    result = await asyncio.to_thread(_cache_lookup, llm_cache, key, prompt, parser)
+    if result is not _MISS:
+        return result
+
+    reply = await llm.ainvoke(prompt_value)
+    text = getattr(reply, "content", reply)
+    result = _parse_reply(text, prompt, parser)
+    await asyncio.to_thread(_cache_store, llm_cache, key, text)
+    return result
+
+
+# -------------------------------
+# LLM client registry
+# -------------------------------
+# (provider, model, temperature, base_url) 별로 인스턴스 하나를 재사용 → HTTP 연결(keep-alive, TLS)도 재사용
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", 20))  # idle connections kept open
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))  # seconds an idle connection is kept
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))
+
+_llm_lock = threading.Lock()
+_llm_clients: Dict[tuple, BaseChatModel] = {}
+# async 연결은 생성된 event loop 에 묶이므로 loop 별로 따로 보관 (loop 가 사라지면 함께 정리)
+_loop_llm_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_http_client: httpx.Client = None
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _shared_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(limits=_http_limits(), timeout=LLM_TIMEOUT)
+    return _http_client
+
+
+def _create_llm(provider: str, model: str, temperature: float, base_url: str, http_async_client) -> BaseChatModel:
     if provider == "openai":
-        return ChatOpenAI(model_name=model, temperature=temperature)
-    
+        return ChatOpenAI(
+            model_name=model,
+            temperature=temperature,
+            base_url=base_url,
+            http_client=_shared_http_client(),
+            http_async_client=http_async_client,
+        )
+
     elif provider == "ollama":
         return OllamaLLM(
-            model=model, 
+            model=model,
             temperature=temperature,
-            base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434")
-)
+            base_url=base_url,
+            client_kwargs={"limits": _http_limits(), "timeout": LLM_TIMEOUT},
+        )
     else:
-        raise ValueError(f"Unsupported provider: {provider}. Use 'openai' or 'ollama'.")
\ No newline at end of file
+        raise ValueError(f"Unsupported provider: {provider}. Use 'openai' or 'ollama'.")
+
+
+def get_llm(model: str = "gpt-4o-mini", temperature: float = 0.3, provider: str = "openai",
+            base_url: str = None) -> BaseChatModel:
+    """
+    Returns an LLM instance based on the specified provider.
+    Supports OpenAI and Ollama.
+
+    Instances are cached per (provider, model, temperature, base_url) and share pooled keep-alive
+    HTTP connections, so repeated calls reuse warm connections. Called inside a running event loop,
+    the instance (and its async connection pool) is cached per loop. Treat returned instances as shared:
+    use `.bind(...)` / `.with_config(...)` instead of mutating them.
+    """
+    if base_url is None:
+        base_url = os.getenv("OLLAMA_HOST", "http://localhost:11434") if provider == "ollama" \
+            else os.getenv("OPENAI_BASE_URL")
+    key = (provider, model, temperature, base_url)
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _llm_lock:
+        if loop is None:
+            clients, http_async_client = _llm_clients, None
+        else:
+            loop_state = _loop_llm_clients.setdefault(loop, {"clients": {}, "http": None})
+            if provider == "openai" and loop_state["http"] is None:
+                loop_state["http"] = httpx.AsyncClient(limits=_http_limits(), timeout=LLM_TIMEOUT)
+            clients, http_async_client = loop_state["clients"], loop_state["http"]
+
+        llm = clients.get(key)
+        if llm is None:
+            llm = clients[key] = _create_llm(provider, model, temperature, base_url, http_async_client)
+        return llm
+
+
+def clear_llm_cache():
+    """Drops cached LLM instances and closes the shared sync HTTP client."""
+    global _http_client
+    with _llm_lock:
+        _llm_clients.clear()
+        _loop_llm_clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
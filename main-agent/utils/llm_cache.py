@@ -0,0 +1,172 @@
+# utils/llm_cache.py
+# Exact-match cache of raw LLM responses, keyed on (provider, model, temperature, rendered prompt messages).
+# Opt-in via LLM_CACHE_BACKEND ("redis" | "sqlite"); entries expire after a TTL and are LRU-evicted past a size bound.
+# Only call sites passing cache=True (deterministic ones such as metadata generation) use it.
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+import orjson
+
+from . import codec
+from .redis_client import redis_bytes_client
+
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "none")  # "redis" | "sqlite" | "none"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 128 * 1024 * 1024))  # sqlite backend total size
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+
+REDIS_KEY_PREFIX = "llm_cache"
+
+
+# ------------------------ Keys ------------------------
+def render_messages(prompt_value: Any) -> list:
+    """Rendered prompt (str or PromptValue) → [[role, content], ...] as sent to the model."""
+    if isinstance(prompt_value, str):
+        return [["human", prompt_value]]
+    return [[message.type, message.content] for message in prompt_value.to_messages()]
+
+
+def describe_llm(llm) -> tuple:
+    """(provider, model, temperature) of an LLM instance."""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    return type(llm).__name__, model, getattr(llm, "temperature", None)
+
+
+def make_cache_key(llm, prompt_value: Any) -> str:
+    provider, model, temperature = describe_llm(llm)
+    raw = orjson.dumps([provider, model, temperature, render_messages(prompt_value)])
+    return hashlib.sha256(raw).hexdigest()
+
+
+# ------------------------ Backends ------------------------
+class RedisLLMCache:
+    """Redis backend: one key per response with TTL, plus a sorted set tracking recency for LRU eviction."""
+
+    def __init__(self, client=redis_bytes_client, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lru_key = f"{REDIS_KEY_PREFIX}:lru"
+
+    def _key(self, key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        blob = self.client.get(self._key(key))
+        if blob is None:
+            self.client.zrem(self.lru_key, key)
+            return None
+        self.client.zadd(self.lru_key, {key: time.time()})
+        return codec.decode(blob)["text"]
+
+    def set(self, key: str, text: str):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), codec.encode({"text": text}), ex=self.ttl)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [k.decode() if isinstance(k, bytes) else k for k, _ in self.client.zpopmin(self.lru_key, overflow)]
+            if evicted:
+                self.client.delete(*[self._key(k) for k in evicted])
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+        self.client.zrem(self.lru_key, key)
+
+    def clear(self):
+        keys = self.client.zrange(self.lru_key, 0, -1)
+        if keys:
+            self.client.delete(*[self._key(k.decode() if isinstance(k, bytes) else k) for k in keys])
+        self.client.delete(self.lru_key)
+
+
+class SqliteLLMCache:
+    """Local SQLite backend: one row per response; accessed_at tracks recency for LRU eviction."""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL,
+                 max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()  # sqlite 연결은 스레드마다 따로
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY, value BLOB NOT NULL,
+                    created_at REAL NOT NULL, accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return codec.decode(row[0])["text"]
+
+    def set(self, key: str, text: str):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, codec.encode({"text": text}), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 오래 사용되지 않은 순서로 한도 안에 들 때까지 삭제
+        evict = []
+        for key, size in conn.execute("SELECT key, LENGTH(value) FROM llm_cache ORDER BY accessed_at"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evict.append((key,))
+            count, total = count - 1, total - size
+        conn.executemany("DELETE FROM llm_cache WHERE key = ?", evict)
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+
+_backend = None
+
+
+def get_llm_cache():
+    """Returns the configured cache backend, or None when caching is disabled (default)."""
+    global _backend
+    if _backend is None and LLM_CACHE_BACKEND != "none":
+        _backend = SqliteLLMCache() if LLM_CACHE_BACKEND == "sqlite" else RedisLLMCache()
+    return _backend
@@ -0,0 +1,160 @@
+# utils/metadata_registry.py
+# Table metadata lookup in Redis: table list from the `<prefix>:table_names` set (SCAN fallback),
+# blobs fetched with one pipelined MGET instead of KEYS + GET per table.
+# Parsed metadata is cached in-process and invalidated through a version key + pub/sub channel.
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+from . import codec
+from .redis_client import redis_bytes_client
+
+METADATA_PREFIX = "metadata"
+MGET_BATCH_SIZE = 500  # keys per MGET inside one pipeline round-trip
+
+METADATA_VERSION_KEY = "metadata_version"  # bumped by data_prep on every metadata / table_relations write
+METADATA_CHANNEL = "metadata_invalidate"  # pub/sub channel announcing a new version
+METADATA_CACHE_ENABLED = os.getenv("METADATA_CACHE", "1") != "0"
+METADATA_CACHE_CHECK_INTERVAL = float(os.getenv("METADATA_CACHE_CHECK_INTERVAL", 5))  # seconds between version reads
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def metadata_key(table_name: str, prefix: str = METADATA_PREFIX) -> str:
+    return f"{prefix}:{table_name}"
+
+
+def list_tables(prefix: str = METADATA_PREFIX, client=redis_bytes_client) -> List[str]:
+    """Registered table names (sorted). Falls back to a non-blocking SCAN when the set is missing."""
+    tables = {_decode(t) for t in client.smembers(f"{prefix}:table_names")}
+    if not tables:
+        for key in client.scan_iter(match=f"{prefix}:*", count=1000):
+            name = _decode(key)[len(prefix) + 1:]
+            if name and name != "table_names" and ":" not in name:
+                tables.add(name)
+    return sorted(tables)
+
+
+def get_metadata_raw(table_names: List[str], prefix: str = METADATA_PREFIX, client=redis_bytes_client) -> Dict[str, str]:
+    """Raw metadata blobs of `table_names` in one pipelined round-trip; missing tables are left out."""
+    if not table_names:
+        return {}
+    pipe = client.pipeline(transaction=False)
+    for i in range(0, len(table_names), MGET_BATCH_SIZE):
+        pipe.mget([metadata_key(t, prefix) for t in table_names[i:i + MGET_BATCH_SIZE]])
+    values = [value for batch in pipe.execute() for value in batch]
+    return {table: value for table, value in zip(table_names, values) if value}
+
+
+def _fetch_metadata(table_names: Optional[List[str]], prefix: str, client) -> Dict[str, dict]:
+    if table_names is None:
+        table_names = list_tables(prefix, client)
+    metadata = {}
+    for table, raw in get_metadata_raw(list(table_names), prefix, client).items():
+        try:
+            metadata[table] = codec.decode(raw)
+        except Exception as e:
+            print(f"⚠️ Error parsing metadata for table {table}: {e}")
+    return metadata
+
+
+# ------------------------ In-process versioned cache ------------------------
+def bump_metadata_version(client=redis_bytes_client) -> int:
+    """Invalidates every process's metadata cache (call after writing metadata or table_relations)."""
+    version = client.incr(METADATA_VERSION_KEY)
+    client.publish(METADATA_CHANNEL, version)
+    return version
+
+
+class MetadataCache:
+    """
+    Parsed values cached per name and tied to the Redis metadata version.
+    The version is re-read at most every `check_interval` seconds, or right away when
+    the pub/sub listener hears a bump. Cached objects are shared: treat them as read-only.
+    """
+
+    def __init__(self, client=redis_bytes_client, check_interval: float = METADATA_CACHE_CHECK_INTERVAL):
+        self.client = client
+        self.check_interval = check_interval
+        self._entries = {}  # name → (version, value)
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def _start_listener(self):
+        def listen():
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(METADATA_CHANNEL)
+                for _ in pubsub.listen():
+                    self.invalidate()
+            except Exception as e:  # pub/sub 없이도 version 폴링으로 동작
+                print(f"⚠️ Metadata cache listener stopped: {e}")
+
+        self._listener = threading.Thread(target=listen, name="metadata_cache_listener", daemon=True)
+        self._listener.start()
+
+    def version(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return self._version
+        version = self.client.get(METADATA_VERSION_KEY)
+        version = (version.decode() if isinstance(version, bytes) else version) or "0"
+        with self._lock:
+            self._version, self._checked_at = version, now
+            if self._listener is None:
+                self._start_listener()
+        return version
+
+    def get_or_load(self, name: str, loader: Callable[[], object]):
+        version = self.version()
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._entries[name] = (version, value)
+        return value
+
+    def discard(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._entries.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+def load_metadata(table_names: Optional[List[str]] = None, prefix: str = METADATA_PREFIX,
+                  client=redis_bytes_client, use_cache: bool = METADATA_CACHE_ENABLED) -> Dict[str, dict]:
+    """
+    Parsed metadata per table, in the order of `table_names` (default: every registered table, sorted).
+    Blobs that fail to parse are reported and skipped. With `use_cache` the whole catalog of `prefix`
+    is loaded once per metadata version and served from memory.
+    """
+    if not use_cache or client is not metadata_cache.client:
+        return _fetch_metadata(table_names, prefix, client)
+
+    catalog = metadata_cache.get_or_load(f"catalog:{prefix}", lambda: _fetch_metadata(None, prefix, client))
+    if table_names is None:
+        return dict(catalog)
+    metadata = {table: catalog[table] for table in table_names if table in catalog}
+    missing = [table for table in table_names if table not in catalog]
+    if missing:  # 등록되지 않은 테이블은 직접 조회 (캐시에 넣지 않음)
+        metadata.update(_fetch_metadata(missing, prefix, client))
+        metadata = {table: metadata[table] for table in table_names if table in metadata}
+    return metadata
+
+
+def get_table_metadata(table_name: str, prefix: str = METADATA_PREFIX, client=redis_bytes_client) -> Optional[dict]:
+    return load_metadata([table_name], prefix, client).get(table_name)
@@ -0,0 +1,60 @@
+# utils/pg_decode.py
+# PostgreSQL result decoding shared by the row and COPY fetch paths: type OID → pandas dtype,
+# and COPY (FORMAT csv) output → typed DataFrame.
+import pandas as pd
+
+try:  # optional: Arrow-backed CSV parsing for the COPY fetch engine
+    import pyarrow  # noqa: F401
+    _CSV_ENGINE = "pyarrow"
+except ImportError:
+    _CSV_ENGINE = "c"
+
+
+# PostgreSQL type OID → pandas dtype used when decoding result columns
+PG_TYPE_DTYPES = {
+    16: "boolean",                          # bool
+    20: "Int64", 21: "Int64", 23: "Int64",  # int8, int2, int4
+    700: "float64", 701: "float64",         # float4, float8
+    1700: "float64",                        # numeric
+    1082: "datetime64[ns]",                 # date
+    1114: "datetime64[ns]",                 # timestamp
+    1184: "datetime64[ns, UTC]",            # timestamptz
+}
+
+COPY_NULL = "\\N"
+PG_INFINITE_TIMESTAMPS = ("infinity", "-infinity")
+
+
+def csv_to_dataframe(buf, columns, type_oids) -> pd.DataFrame:
+    """Decodes COPY CSV output into typed columns according to the result's type OIDs."""
+    dtypes, date_cols, float_cols = {}, {}, []
+    for name, oid in zip(columns, type_oids):
+        dtype = PG_TYPE_DTYPES.get(oid, object)
+        if isinstance(dtype, str) and dtype.startswith("datetime64"):
+            date_cols[name] = dtype.endswith("UTC]")
+            dtype = object
+        elif dtype == "float64":
+            # COPY 는 float8/numeric 특수값을 NaN / Infinity / -Infinity 로 씀 → 문자열로 읽고 float() 규칙으로 변환
+            float_cols.append(name)
+            dtype = object
+        dtypes[name] = dtype
+
+    df = pd.read_csv(
+        buf,
+        names=columns,
+        header=None,
+        dtype=dtypes,
+        na_values=[COPY_NULL],
+        keep_default_na=False,
+        true_values=["t"],
+        false_values=["f"],
+        engine=_CSV_ENGINE,
+    )
+    for name in float_cols:
+        df[name] = df[name].astype("float64")
+    for name, utc in date_cols.items():
+        # PostgreSQL 은 소수초의 끝 0 을 잘라내므로 행마다 형식이 다름 → ISO8601 로 행 단위 파싱
+        # infinity / -infinity 는 datetime64 로 표현할 수 없으므로 NaT
+        values = df[name].where(~df[name].isin(PG_INFINITE_TIMESTAMPS))
+        df[name] = pd.to_datetime(values, utc=utc, format="ISO8601")
+    return df
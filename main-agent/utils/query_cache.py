@@ -0,0 +1,264 @@
+# utils/query_cache.py
+# Result-set cache for executed SQL, keyed on (db_id, normalized SQL, schema version).
+# Results are stored column-wise (orjson + zstd) in Redis or on local disk with TTL and LRU eviction.
+import os
+import re
+import math
+import time
+import hashlib
+import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import orjson
+import zstandard
+
+from .config import DB_CONFIG
+from .redis_client import redis_client, redis_bytes_client
+
+
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "redis")  # "redis" | "disk" | "none"
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 300))  # seconds
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 500))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # disk backend total size
+QUERY_CACHE_MAX_ENTRY_BYTES = int(os.getenv("QUERY_CACHE_MAX_ENTRY_BYTES", 8 * 1024 * 1024))  # skip larger results
+# 인코딩 전에 거르는 상한 (행 수 × 컬럼 수): 어차피 버려질 큰 결과의 직렬화/압축 비용을 피함
+QUERY_CACHE_MAX_ENTRY_CELLS = int(os.getenv("QUERY_CACHE_MAX_ENTRY_CELLS", 2_000_000))
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR", ".cache/query_results")
+
+SCHEMA_VERSION_KEY = "schema_version"  # per database: schema_version:{db_id}
+REDIS_KEY_PREFIX = "query_cache"
+
+_compressor = zstandard.ZstdCompressor(level=3)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+# ------------------------ Keys ------------------------
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_READ_ONLY = re.compile(r"^\s*(select|with)\b")
+_WRITE_KEYWORDS = re.compile(r"\b(insert|update|delete|merge|truncate|create|alter|drop|grant|for\s+update)\b")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace and lowercases everything outside string literals and quoted identifiers."""
+    parts = _QUOTED.split(sql.strip().rstrip(";"))
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2 == 1:  # quoted literal / identifier → keep as is
+            normalized.append(part)
+        else:
+            normalized.append(re.sub(r"\s+", " ", part).lower())
+    return "".join(normalized).strip()
+
+
+def is_cacheable(normalized_sql: str) -> bool:
+    unquoted = _QUOTED.sub("''", normalized_sql)
+    return bool(_READ_ONLY.match(unquoted)) and not _WRITE_KEYWORDS.search(unquoted)
+
+
+def _schema_version_key(db_id: str = None) -> str:
+    # db_id=None 은 기본 DB (연결과 같은 규칙)
+    return f"{SCHEMA_VERSION_KEY}:{db_id or DB_CONFIG['dbname']}"
+
+
+def get_schema_version(db_id: str = None) -> str:
+    return redis_client.get(_schema_version_key(db_id)) or "0"
+
+
+def bump_schema_version(db_id: str = None) -> int:
+    """Invalidates the cached results of one database by moving it to a new schema version."""
+    return redis_client.incr(_schema_version_key(db_id))
+
+
+def make_cache_key(db_id: str, normalized_sql: str, schema_version: str, max_rows: int = None) -> str:
+    raw = f"{db_id}\x00{schema_version}\x00{max_rows}\x00{normalized_sql}".encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+# ------------------------ Columnar encoding ------------------------
+# orjson 이 그대로 표현 못하는 타입은 컬럼 단위 태그로 복원
+_ENCODERS = {
+    Decimal: ("decimal", str),
+    datetime.datetime: ("datetime", lambda v: v.isoformat()),
+    datetime.date: ("date", lambda v: v.isoformat()),
+    datetime.time: ("time", lambda v: v.isoformat()),
+    datetime.timedelta: ("timedelta", lambda v: v.total_seconds()),
+}
+_DECODERS = {
+    "decimal": Decimal,
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "timedelta": lambda v: datetime.timedelta(seconds=v),
+    "float": float,
+}
+
+
+def _encode_float(v: float):
+    # orjson 은 NaN / ±Infinity 를 null 로 쓰므로 NULL 과 구분되도록 문자열로 보관
+    return v if math.isfinite(v) else repr(v)
+
+
+def encode_result(rows, columns) -> bytes:
+    col_values = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+    tags = []
+    for i, values in enumerate(col_values):
+        sample = next((v for v in values if v is not None), None)
+        tag, encode = _ENCODERS.get(type(sample), (None, None))
+        if isinstance(sample, float) and not all(v is None or math.isfinite(v) for v in values):
+            tag, encode = "float", _encode_float
+        if tag:
+            col_values[i] = [None if v is None else encode(v) for v in values]
+        tags.append(tag)
+    payload = orjson.dumps({"columns": columns, "types": tags, "data": col_values})
+    return _compressor.compress(payload)
+
+
+def decode_result(blob: bytes):
+    payload = orjson.loads(_decompressor.decompress(blob))
+    col_values = payload["data"]
+    for i, tag in enumerate(payload["types"]):
+        if tag:
+            decode = _DECODERS[tag]
+            col_values[i] = [None if v is None else decode(v) for v in col_values[i]]
+    rows = list(zip(*col_values)) if col_values else []
+    return rows, payload["columns"]
+
+
+# ------------------------ Backends ------------------------
+class RedisResultCache:
+    """Redis backend: one key per result with TTL, plus a sorted set tracking recency for LRU eviction."""
+
+    def __init__(self, client=redis_bytes_client, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lru_key = f"{REDIS_KEY_PREFIX}:lru"
+
+    def _key(self, key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:{key}"
+
+    def get(self, key: str):
+        blob = self.client.get(self._key(key))
+        if blob is None:
+            self.client.zrem(self.lru_key, key)
+            return None
+        self.client.zadd(self.lru_key, {key: time.time()})
+        return blob
+
+    def set(self, key: str, blob: bytes):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), blob, ex=self.ttl)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [k.decode() if isinstance(k, bytes) else k for k, _ in self.client.zpopmin(self.lru_key, overflow)]
+            if evicted:
+                self.client.delete(*[self._key(k) for k in evicted])
+
+    def clear(self):
+        keys = self.client.zrange(self.lru_key, 0, -1)
+        if keys:
+            self.client.delete(*[self._key(k.decode() if isinstance(k, bytes) else k) for k in keys])
+        self.client.delete(self.lru_key)
+
+
+class DiskResultCache:
+    """Local disk backend: one file per result; file mtime tracks recency for LRU eviction."""
+
+    def __init__(self, directory=QUERY_CACHE_DIR, ttl=QUERY_CACHE_TTL,
+                 max_entries=QUERY_CACHE_MAX_ENTRIES, max_bytes=QUERY_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.zst"
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # 앞 8바이트 = 저장 시각 (TTL 판단용)
+        stored_at = int.from_bytes(blob[:8], "big")
+        if time.time() - stored_at > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)  # LRU 갱신
+        return blob[8:]
+
+    def set(self, key: str, blob: bytes):
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(int(time.time()).to_bytes(8, "big") + blob)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for p in self.directory.glob("*.zst"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, p = entries.pop(0)
+            p.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for p in self.directory.glob("*.zst"):
+            p.unlink(missing_ok=True)
+
+
+_backend = None
+
+
+def get_result_cache():
+    """Returns the configured cache backend, or None when caching is disabled."""
+    global _backend
+    if _backend is None and QUERY_CACHE_BACKEND != "none":
+        _backend = DiskResultCache() if QUERY_CACHE_BACKEND == "disk" else RedisResultCache()
+    return _backend
+
+
+# ------------------------ Public API ------------------------
+def cached_query(db_id: str, sql: str, execute, max_rows: int = None):
+    """
+    Returns (rows, column_names) for `sql`, served from the cache when possible.
+    `execute()` runs the query on a miss. Cache failures never fail the query.
+    """
+    cache = get_result_cache()
+    normalized = normalize_sql(sql)
+    if cache is None or not is_cacheable(normalized):
+        return execute()
+
+    try:
+        key = make_cache_key(db_id, normalized, get_schema_version(db_id), max_rows)
+        blob = cache.get(key)
+        if blob is not None:
+            return decode_result(blob)
+    except Exception as e:
+        print(f"⚠️ Query cache lookup failed: {e}")
+        key = None
+
+    rows, columns = execute()
+
+    if key is not None and len(rows) * max(len(columns), 1) <= QUERY_CACHE_MAX_ENTRY_CELLS:
+        try:
+            blob = encode_result(rows, columns)
+            if len(blob) <= QUERY_CACHE_MAX_ENTRY_BYTES:
+                cache.set(key, blob)
+        except Exception as e:
+            print(f"⚠️ Query cache store failed: {e}")
+    return rows, columns
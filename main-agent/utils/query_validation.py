@@ -2,6 +2,8 @@ import re
 from typing import Dict
 from collections import defaultdict
 
+from .table_names import split_column_ref
+
 def extract_table_metadata(table_markdowns):
     table_metadata = defaultdict(set)
     primary_keys = set()
@@ -42,7 +44,7 @@ def validate_parsed_query(parsed_query, table_metadata, primary_keys):
             if '.' not in field:
                 continue
 
-            table, col = field.split('.')
+            table, col = split_column_ref(field)
             col_set = table_metadata.get(table, set())
 
             full_col = f"{table}.{col}"
@@ -63,7 +65,7 @@ def validate_parsed_query(parsed_query, table_metadata, primary_keys):
 def _is_identifier_like(var: str, table_metadata: Dict[str, set], primary_keys: set) -> bool:
     if '.' not in var:
         return False
-    table, col = var.split('.')
+    table, col = split_column_ref(var)
     full_col = f"{table}.{col}"
 
     # 존재하지 않는 컬럼
@@ -0,0 +1,54 @@
+# utils/rate_limiter.py
+# Requests/min + tokens/min limiter shared by concurrent asyncio tasks (e.g. batched LLM calls).
+import time
+import asyncio
+from collections import deque
+
+try:  # optional: exact token counts for OpenAI models
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of `text` (tiktoken when available, ~4 characters per token otherwise)."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+class AsyncRateLimiter:
+    """
+    Sliding-window limiter: at most `rpm` requests and `tpm` tokens in any `window` seconds.
+    `await limiter.acquire(tokens)` waits until the request fits; None disables a limit.
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+
+    def _expire(self, now: float):
+        while self._events and now - self._events[0][0] >= self.window:
+            _, tokens = self._events.popleft()
+            self._tokens -= tokens
+
+    async def acquire(self, tokens: int = 0):
+        # 한도보다 큰 요청은 한도만큼으로 취급 (영원히 대기하지 않도록)
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                fits_requests = self.rpm is None or len(self._events) < self.rpm
+                fits_tokens = self.tpm is None or self._tokens + tokens <= self.tpm
+                if fits_requests and fits_tokens:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                wait = self._events[0][0] + self.window - now
+            await asyncio.sleep(max(wait, 0.05))
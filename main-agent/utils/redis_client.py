@@ -3,4 +3,7 @@ from redis.asyncio import Redis
 from .config import REDIS_CONFIG
 
 redis_client = redis.Redis(**REDIS_CONFIG)
-async_redis_client = redis.asyncio.Redis(**REDIS_CONFIG)
\ No newline at end of file
+async_redis_client = redis.asyncio.Redis(**REDIS_CONFIG)
+
+# 압축/바이너리 값(zstd 등) 전용: decode_responses 를 끈 클라이언트
+redis_bytes_client = redis.Redis(**{**REDIS_CONFIG, "decode_responses": False})
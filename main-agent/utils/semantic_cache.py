@@ -0,0 +1,133 @@
+# utils/semantic_cache.py
+# Semantic cache for text2sql: question embedding → validated SQL, per (db_id, schema version).
+# Each (db_id, schema version) has its own FAISS index persisted on local disk; a schema change
+# of that db_id (bump_schema_version) moves lookups to a fresh index and the stale ones are removed.
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_openai import OpenAIEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from .query_cache import get_schema_version
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("TEXT2SQL_SEMANTIC_CACHE", "0") == "1"  # opt-in
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("TEXT2SQL_SEMANTIC_CACHE_THRESHOLD", 0.95))  # cosine similarity
+SEMANTIC_CACHE_DIR = os.getenv("TEXT2SQL_SEMANTIC_CACHE_DIR", ".cache/text2sql_semantic")
+SEMANTIC_CACHE_EMBEDDING_MODEL = os.getenv("TEXT2SQL_SEMANTIC_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+
+
+class SemanticSQLCache:
+    """
+    FAISS (inner product over normalized embeddings = cosine similarity) index of questions whose SQL
+    passed review. Indexes are loaded lazily, reloaded when another process saved a newer copy,
+    and saved after every insert.
+    """
+
+    def __init__(self, directory=SEMANTIC_CACHE_DIR, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 embedding_model=SEMANTIC_CACHE_EMBEDDING_MODEL):
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.embeddings = OpenAIEmbeddings(model=embedding_model)
+        self._stores = {}  # (db_id, version) → (FAISS, mtime of the saved index)
+        self._lock = threading.Lock()
+
+    def _path(self, db_id: str, version: str) -> Path:
+        return self.directory / db_id / f"v{version}"
+
+    def _load(self, db_id: str, version: str) -> Optional[FAISS]:
+        path = self._path(db_id, version)
+        index_file = path / "index.faiss"
+        mtime = index_file.stat().st_mtime if index_file.exists() else None
+        cached = self._stores.get((db_id, version))
+        if cached is not None and cached[1] == mtime:
+            return cached[0]
+        if mtime is None:
+            return cached[0] if cached else None
+        store = FAISS.load_local(
+            str(path), self.embeddings,
+            allow_dangerous_deserialization=True,  # 이 프로세스가 직접 저장한 파일만 읽음
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+        self._stores[(db_id, version)] = (store, mtime)
+        return store
+
+    def _drop_stale_versions(self, db_id: str, version: str):
+        current = self._path(db_id, version)
+        for path in (self.directory / db_id).glob("v*"):
+            if path != current:
+                shutil.rmtree(path, ignore_errors=True)
+        for key in [k for k in self._stores if k[0] == db_id and k[1] != version]:
+            del self._stores[key]
+
+    def embed(self, question: str) -> List[float]:
+        return self.embeddings.embed_query(question)
+
+    def lookup(self, db_id: str, embedding: List[float]) -> Optional[dict]:
+        """Best cached entry {"question", "sql", "score"} at or above the threshold, else None."""
+        version = get_schema_version(db_id)
+        with self._lock:
+            store = self._load(db_id, version)
+            if store is None:
+                return None
+            hits = store.similarity_search_with_score_by_vector(embedding, k=1)
+        if not hits:
+            return None
+        doc, score = hits[0]
+        if score < self.threshold:
+            return None
+        return {"question": doc.page_content, "sql": doc.metadata["sql"], "score": float(score)}
+
+    def _save(self, store: FAISS, db_id: str, version: str):
+        # 임시 디렉터리에 저장 후 파일 단위로 교체 → 다른 프로세스가 쓰다 만 파일을 읽지 않음
+        path = self._path(db_id, version)
+        path.mkdir(parents=True, exist_ok=True)
+        tmp = path / f".tmp.{os.getpid()}.{threading.get_ident()}"
+        store.save_local(str(tmp))
+        os.replace(tmp / "index.pkl", path / "index.pkl")
+        os.replace(tmp / "index.faiss", path / "index.faiss")  # reload 판단 기준(mtime)이므로 마지막에 교체
+        shutil.rmtree(tmp, ignore_errors=True)
+        self._stores[(db_id, version)] = (store, (path / "index.faiss").stat().st_mtime)
+
+    def add(self, db_id: str, question: str, embedding: List[float], sql: str):
+        version = get_schema_version(db_id)
+        with self._lock:
+            store = self._load(db_id, version)
+            metadata = {"sql": sql, "schema_version": version}
+            if store is None:
+                self._drop_stale_versions(db_id, version)
+                store = FAISS.from_embeddings(
+                    [(question, embedding)], self.embeddings, metadatas=[metadata],
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+                )
+            else:
+                store.add_embeddings([(question, embedding)], metadatas=[metadata])
+            self._save(store, db_id, version)
+
+    def remove(self, db_id: str, question: str):
+        """Drops entries for `question` (e.g. cached SQL that no longer executes)."""
+        version = get_schema_version(db_id)
+        with self._lock:
+            store = self._load(db_id, version)
+            if store is None:
+                return
+            ids = [doc_id for doc_id in store.index_to_docstore_id.values()
+                   if store.docstore.search(doc_id).page_content == question]
+            if ids:
+                store.delete(ids)
+                self._save(store, db_id, version)
+
+
+_cache = None
+
+
+def get_semantic_cache() -> Optional[SemanticSQLCache]:
+    """Returns the process-wide cache, or None when disabled (default)."""
+    global _cache
+    if _cache is None and SEMANTIC_CACHE_ENABLED:
+        _cache = SemanticSQLCache()
+    return _cache
@@ -0,0 +1,231 @@
+# utils/sql_sampling.py
+# Server-side sampling rewrites for causal extraction SQL (and `strip_sql` for wrapping a query as a subquery).
+import re
+from typing import Optional, Dict, Any, Tuple
+
+SAMPLING_METHODS = ("system", "bernoulli", "hash")
+DEFAULT_SAMPLE_ROWS = 50000
+DEFAULT_SEED = 42
+OVERSAMPLE = 1.2  # joins/filters drop some sampled rows, so sample a bit more than the target
+HASH_BUCKETS = 1 << 20
+SAMPLE_COLUMN_PREFIX = "_sample_"
+
+_IDENT = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+_TABLE_REF = re.compile(
+    rf'\s*(?P<table>{_IDENT}(?:\.{_IDENT})?)'
+    rf'(?P<alias>\s+(?:AS\s+)?(?!(?:WHERE|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|GROUP|ORDER|LIMIT|OFFSET|FETCH|ON|'
+    rf'NATURAL|UNION|EXCEPT|INTERSECT|HAVING|WINDOW|FOR)\b){_IDENT})?',
+    re.IGNORECASE
+)
+_CTE_NAME = re.compile(
+    rf'\s*(?P<name>{_IDENT})\s*(?P<columns>\()?',
+    re.IGNORECASE
+)
+_CTE_BODY = re.compile(r'\s*AS\s+(?:NOT\s+)?(?:MATERIALIZED\s+)?\(', re.IGNORECASE)
+_WITH = re.compile(r'\s*WITH\s+(?:RECURSIVE\s+)?', re.IGNORECASE)
+
+
+def _skip_literal(sql: str, i: int) -> int:
+    """Index right after the quoted literal / identifier starting at `i`."""
+    ch, n = sql[i], len(sql)
+    end = sql.find(ch, i + 1)
+    while end != -1 and end + 1 < n and sql[end + 1] == ch:  # escaped quote
+        end = sql.find(ch, end + 2)
+    return n if end == -1 else end + 1
+
+
+def _skip_parens(sql: str, i: int) -> int:
+    """Index right after the parenthesized group opening at `i`."""
+    depth, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"'):
+            i = _skip_literal(sql, i)
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def _unquote(name: str) -> str:
+    return name[1:-1] if name.startswith('"') else name.lower()
+
+
+def cte_names(sql: str) -> set:
+    """Names defined by the leading WITH clause (unquoted / lowercased like PostgreSQL resolves them)."""
+    m = _WITH.match(sql)
+    if not m:
+        return set()
+    names, i = set(), m.end()
+    while True:
+        m = _CTE_NAME.match(sql, i)
+        if not m:
+            return names
+        names.add(_unquote(m.group("name")))
+        i = _skip_parens(sql, m.start("columns")) if m.group("columns") else m.end()
+        body = _CTE_BODY.match(sql, i)
+        if not body:
+            return names
+        i = _skip_parens(sql, body.end() - 1)
+        comma = re.compile(r"\s*,").match(sql, i)
+        if not comma:
+            return names
+        i = comma.end()
+
+
+def _top_level_from(sql: str) -> Optional[int]:
+    """Index right after the first top-level FROM keyword (outside parentheses and literals)."""
+    depth, i, n = 0, 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"'):
+            i = _skip_literal(sql, i)
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and sql[i:i + 4].upper() == "FROM" and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")) \
+                and (i + 4 >= n or not (sql[i + 4].isalnum() or sql[i + 4] == "_")):
+            return i + 4
+        i += 1
+    return None
+
+
+def find_driving_table(sql: str) -> Optional[Tuple[str, int]]:
+    """
+    (table name, insert position after the table reference/alias) of the top-level FROM, if it is a plain table.
+    CTE references and function calls are not tables (TABLESAMPLE would be rejected) → None.
+    """
+    pos = _top_level_from(sql)
+    if pos is None:
+        return None
+    m = _TABLE_REF.match(sql, pos)
+    if not m:
+        return None
+    table = m.group("table")
+    if sql[m.end("table"):].lstrip().startswith("("):  # set-returning function
+        return None
+    if "." not in table and _unquote(table) in cte_names(sql):
+        return None
+    return table, m.end()
+
+
+def strip_sql(sql: str) -> str:
+    """
+    `sql` without trailing semicolons, whitespace and comments, so it can be wrapped as a subquery
+    (a trailing `-- comment` would otherwise swallow the closing parenthesis).
+    """
+    end, i, n = 0, 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"'):
+            i = _skip_literal(sql, i)
+            end = i
+        elif sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = n if newline == -1 else newline + 1
+        elif sql.startswith("/*", i):
+            close = sql.find("*/", i + 2)
+            i = n if close == -1 else close + 2
+        else:
+            i += 1
+            if not ch.isspace() and ch != ";":
+                end = i
+    return sql[:end].strip()
+
+
+def _quote(col: str) -> str:
+    col = col.split(".")[-1]
+    return col if col.startswith('"') else f'"{col}"'
+
+
+def apply_tablesample(sql: str, method: str, percent: float, seed: int) -> Optional[str]:
+    """Adds `TABLESAMPLE SYSTEM|BERNOULLI (p) REPEATABLE (seed)` to the driving table, or None if not possible."""
+    found = find_driving_table(sql)
+    if not found:
+        return None
+    _, insert_at = found
+    clause = f" TABLESAMPLE {method.upper()} ({percent:.6f}) REPEATABLE ({int(seed)})"
+    return sql[:insert_at] + clause + sql[insert_at:]
+
+
+def apply_hash_sample(sql: str, fraction: float, seed: int, key_column: Optional[str] = None) -> str:
+    """Deterministic sample: keep rows whose seeded hash (of the key column, or the whole row) falls under `fraction`."""
+    hashed = f"_s.{_quote(key_column)}::text" if key_column else "_s::text"
+    threshold = max(1, int(fraction * HASH_BUCKETS))
+    return (
+        f"SELECT * FROM ({strip_sql(sql)}) AS _s "
+        f"WHERE (hashtextextended({hashed}, {int(seed)}) & {HASH_BUCKETS - 1}) < {threshold}"
+    )
+
+
+def apply_stratified_sample(sql: str, stratify_on: str, target_rows: int, seed: int,
+                            min_per_stratum: int = 30, key_column: Optional[str] = None) -> str:
+    """
+    Proportional sample per level of `stratify_on` (keeps at least `min_per_stratum` rows of every level,
+    so rare treatment levels survive). Meant for discrete treatments; row order within a level is a seeded hash.
+    """
+    col = _quote(stratify_on)
+    hashed = f"_s.{_quote(key_column)}::text" if key_column else "_s::text"
+    p = SAMPLE_COLUMN_PREFIX
+    return (
+        f"SELECT * FROM ("
+        f"SELECT _s.*, "
+        f"ROW_NUMBER() OVER (PARTITION BY _s.{col} ORDER BY hashtextextended({hashed}, {int(seed)})) AS {p}rn, "
+        f"COUNT(*) OVER (PARTITION BY _s.{col}) AS {p}n, "
+        f"COUNT(*) OVER () AS {p}total "
+        f"FROM ({strip_sql(sql)}) AS _s"
+        f") AS _t WHERE {p}rn <= GREATEST({int(min_per_stratum)}, CEIL({int(target_rows)} * {p}n::float8 / {p}total))"
+    )
+
+
+def build_sampled_sql(sql: str, config: Dict[str, Any], result_rows: Optional[float] = None,
+                      treatment_column: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Rewrites `sql` according to a sampling config:
+        {"method": "system" | "bernoulli" | "hash", "target_rows": int, "seed": int,
+         "stratify": bool, "key_column": str, "min_per_stratum": int}
+    `result_rows` is the planner estimate of the rows `sql` returns (EXPLAIN "Plan Rows", after filters
+    and joins), not the driving table's size. The fraction is target_rows / result_rows for both rewrites:
+    the hash sample filters the result directly, and sampling the driving table at fraction f keeps
+    about f of the result too, since each result row comes from one driving-table row (filters and
+    many-to-one joins keep that proportion).
+    Returns (sampled_sql, sample_info) — sample_info records what was actually applied.
+    """
+    method = config.get("method", "system").lower()
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unsupported sampling method: {method}. Use one of {SAMPLING_METHODS}.")
+    target_rows = int(config.get("target_rows", DEFAULT_SAMPLE_ROWS))
+    seed = int(config.get("seed", DEFAULT_SEED))
+    key_column = config.get("key_column")
+
+    info = {"method": method, "seed": seed, "target_rows": target_rows, "population_estimate": result_rows}
+
+    if config.get("stratify") and treatment_column:
+        info.update(method="stratified", stratify_on=treatment_column)
+        sampled = apply_stratified_sample(sql, treatment_column, target_rows, seed,
+                                          config.get("min_per_stratum", 30), key_column)
+        return sampled, info
+
+    if result_rows is not None and result_rows <= target_rows:
+        info.update(method="none", fraction=1.0)
+        return sql, info
+
+    fraction = min(1.0, target_rows * OVERSAMPLE / result_rows) if result_rows else None
+    if method in ("system", "bernoulli") and fraction is not None:
+        sampled = apply_tablesample(sql, method, fraction * 100, seed)
+        if sampled:
+            info["fraction"] = fraction
+            return sampled, info
+        # driving table 이 서브쿼리 / CTE / 함수면 hash 샘플링으로 대체
+        info["method"] = "hash"
+
+    fraction = fraction if fraction is not None else 1.0
+    info["fraction"] = fraction
+    return apply_hash_sample(sql, fraction, seed, key_column), info
@@ -0,0 +1,31 @@
+# utils/table_names.py
+# Table / column naming of the extracted schema: tables in `public` are bare names,
+# tables elsewhere are "schema.table", so column references may have two or three parts.
+from typing import Dict, List, Tuple
+
+
+def table_name(schema: str, relname: str) -> str:
+    """Key of a table in the extracted schema: bare name in `public`, `schema.table` elsewhere."""
+    return relname if schema == "public" else f"{schema}.{relname}"
+
+
+def split_table_name(table: str) -> Tuple[str, str]:
+    schema, _, relname = table.rpartition(".")
+    return schema or "public", relname
+
+
+def split_column_ref(ref: str) -> Tuple[str, str]:
+    """"table.col" / "schema.table.col" → (table key, column)."""
+    table, col = ref.rsplit(".", 1)
+    return table, col
+
+
+def foreign_key_edges(metadata: Dict[str, dict]) -> List[Tuple[str, str, dict]]:
+    """(referenced table, referencing table, column info) for every FK column in table metadata."""
+    edges = []
+    for src_table, data in metadata.items():
+        for col, info in data["schema"]["columns"].items():
+            if info.get("fk"):
+                ref_table, _ = split_column_ref(info["fk"])
+                edges.append((ref_table, src_table, info))
+    return edges